@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Property, PropertyImage
+from .filters import search_properties
+from .models import ArchivedProperty, MarketStat, Property, PropertyImage
 from apps.users.models import User  # Import your custom User model
 
 class PropertyImageInline(admin.TabularInline):
@@ -20,13 +21,14 @@ class PropertyImageInline(admin.TabularInline):
 class PropertyAdmin(admin.ModelAdmin):
     inlines = [PropertyImageInline]
     list_display = ('title', 'property_type', 'city', 'price', 'status', 'user_link', 'is_active')
-    list_filter = ('property_type', 'status', 'is_active', 'city')
+    list_filter = ('property_type', 'status', 'is_active', 'deleted_at', 'city')
     search_fields = ('title', 'description', 'city', 'address')
     raw_id_fields = ('user',)
+    readonly_fields = ('deleted_at',)
     
     fieldsets = (
         (None, {
-            'fields': ('title', 'description', 'user', 'price', 'is_active')
+            'fields': ('title', 'description', 'user', 'price', 'is_active', 'deleted_at')
         }),
         ('Property Details', {
             'fields': ('property_type', 'status', 'surface_area', 'rooms', 'bedrooms', 'bathrooms', 'furnished')
@@ -43,4 +45,46 @@ class PropertyAdmin(admin.ModelAdmin):
             return format_html('<a href="{}">{}</a>', url, obj.user.username)
         return "-"
     user_link.short_description = 'User'
-    user_link.admin_order_field = 'user'
\ No newline at end of file
+    user_link.admin_order_field = 'user'
+    
+    def get_queryset(self, request):
+        # Soft-deleted listings stay visible here until they're purged
+        return Property.all_objects.all()
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the indexed full-text search instead of icontains scans
+        if not search_term.strip():
+            return queryset, False
+        return search_properties(queryset, search_term), False
+
+@admin.register(ArchivedProperty)
+class ArchivedPropertyAdmin(admin.ModelAdmin):
+    """Read-only: rows are moved here by `manage.py archive_properties`"""
+    list_display = ('title', 'property_type', 'city', 'price', 'status', 'user', 'archived_at')
+    list_filter = ('property_type', 'status', 'city')
+    search_fields = ('title', 'city', 'address')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(MarketStat)
+class MarketStatAdmin(admin.ModelAdmin):
+    """Read-only: rows are written by `manage.py refresh_market_stats`"""
+    list_display = (
+        'city', 'property_type', 'status', 'listing_count', 'median_price',
+        'p25_price_per_m2', 'median_price_per_m2', 'p75_price_per_m2', 'refreshed_at',
+    )
+    list_filter = ('property_type', 'status', 'city')
+    search_fields = ('city',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
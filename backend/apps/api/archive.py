@@ -0,0 +1,106 @@
+"""
+Soft delete and archival of listings.
+
+DELETE only stamps `Property.deleted_at`, which hides the listing from every
+query through the default manager. `manage.py archive_properties` then
+keeps the hot table small: soft-deleted listings past their retention are
+purged, and listings that have been sold, rented or inactive for a while
+are moved, with their images, into ArchivedProperty under the same id so
+they can still be fetched by id.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import invalidate_properties
+from .models import ArchivedProperty, ArchivedPropertyImage, Property, PropertyImage
+from .storage import add_reference
+
+ARCHIVE_BATCH_SIZE = 500
+
+# Statuses that take a listing out of the market
+CLOSED_STATUSES = ('sold', 'rented')
+
+ARCHIVED_FIELDS = [
+    f.attname for f in ArchivedProperty._meta.concrete_fields if f.name != 'archived_at'
+]
+ARCHIVED_IMAGE_FIELDS = ('image', 'is_cover', 'thumbnails', 'created_at')
+
+
+def archive_after():
+    return timedelta(days=getattr(settings, 'PROPERTY_ARCHIVE_AFTER_DAYS', 180))
+
+
+def deleted_retention():
+    return timedelta(days=getattr(settings, 'PROPERTY_DELETED_RETENTION_DAYS', 30))
+
+
+def archivable(cutoff):
+    """Closed or inactive listings untouched since `cutoff`"""
+    return Property.objects.filter(
+        Q(is_active=False) | Q(status__in=CLOSED_STATUSES), updated_at__lt=cutoff
+    )
+
+
+def archive_batch(queryset, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to `batch_size` listings of `queryset` into the archive in one
+    transaction and return their ids. Rows locked by a writer are skipped
+    and picked up by a later run.
+    """
+    with transaction.atomic():
+        pks = list(
+            queryset.order_by('pk').select_for_update(skip_locked=True, of=('self',))
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return []
+        rows = Property.objects.filter(pk__in=pks).values(*ARCHIVED_FIELDS)
+        ArchivedProperty.objects.bulk_create([ArchivedProperty(**row) for row in rows])
+        images = PropertyImage.objects.filter(property__in=pks).values('property_id', *ARCHIVED_IMAGE_FIELDS)
+        archived_images = ArchivedPropertyImage.objects.bulk_create(
+            [ArchivedPropertyImage(**image) for image in images]
+        )
+        # The archive holds on to the files: count its references before the
+        # cascade below releases the PropertyImage ones
+        for image in archived_images:
+            add_reference(image.image.name)
+        Property.all_objects.filter(pk__in=pks).delete()
+        invalidate_properties(pks)
+    return pks
+
+
+def purge_batch(queryset, batch_size=ARCHIVE_BATCH_SIZE):
+    """Permanently delete up to `batch_size` listings; returns their ids"""
+    with transaction.atomic():
+        pks = list(
+            queryset.order_by('pk').select_for_update(skip_locked=True, of=('self',))
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if pks:
+            Property.all_objects.filter(pk__in=pks).delete()
+    return pks
+
+
+def archive_properties(after=None, retention=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Purge soft-deleted listings older than `retention` and archive closed
+    ones untouched for `after` (both default to the settings).
+    Returns (purged, archived).
+    """
+    now = timezone.now()
+    retention = deleted_retention() if retention is None else retention
+    after = archive_after() if after is None else after
+    expired = Property.all_objects.filter(deleted_at__lt=now - retention)
+    purged = 0
+    while batch := purge_batch(expired, batch_size):
+        purged += len(batch)
+
+    stale = archivable(now - after)
+    archived = 0
+    while batch := archive_batch(stale, batch_size):
+        archived += len(batch)
+    return purged, archived
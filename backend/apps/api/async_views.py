@@ -0,0 +1,223 @@
+"""
+Async versions of the read-heavy endpoints and login.
+
+Under ASGI these run on the event loop and only hand individual ORM calls
+to the database thread, so slow clients no longer pin a worker thread for
+the whole request. They are the only implementation of these reads and of
+login; the methods they don't implement (the writes) are passed to the
+sync DRF views in `views.py`.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.core.cache import cache
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAcceptable, NotFound
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from apps.users.throttling import LoginAccountThrottle, LoginIPThrottle
+from apps.users.tokens import issue_tokens
+from . import views
+from .caching import cached_response, detail_cache_key, list_cache_key, make_entry
+from .filters import FilterError, filter_properties, get_ordering
+from .metrics import timing
+from .models import Property
+from .pagination import KeysetPagination
+from .serializer import PropertyCardSerializer, PropertySerializer, UserSerializer
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def rendered(request, response):
+    """
+    Render a DRF Response built outside an APIView with the renderer content
+    negotiation picks for `request`, here rather than on the handler's
+    thread. The browsable API needs a view, so it isn't offered.
+    """
+    if not isinstance(response, Response):
+        return response
+    if not isinstance(request, Request):
+        request = Request(request)
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    ]
+    try:
+        renderer, media_type = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS().select_renderer(request, renderers)
+    except NotAcceptable as e:
+        renderer, media_type = renderers[0], renderers[0].media_type
+        response = Response({'detail': e.detail}, status=status.HTTP_406_NOT_ACCEPTABLE)
+    response.accepted_renderer = renderer
+    response.accepted_media_type = media_type
+    response.renderer_context = {'request': request, 'response': response}
+    response.render()
+    return response
+
+
+def authenticated_request(request):
+    """
+    Wrap `request` like an APIView would and authenticate it up front, so a
+    bad token is still rejected. Bearer tokens are verified without queries.
+    Returns the DRF request and an error response (or None).
+    """
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    request = Request(request, authenticators=authenticators)
+    try:
+        request.user
+    except AuthenticationFailed as e:
+        response = Response({'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        header = authenticators[0].authenticate_header(request) if authenticators else None
+        if header:
+            response['WWW-Authenticate'] = header
+        return request, rendered(request, response)
+    return request, None
+
+
+def cached_entry(key_func, *args):
+    key = key_func(*args)
+    return key, cache.get(key)
+
+
+@csrf_exempt
+async def aproperties(request):
+    """GET of the property list; other methods go to `views.create_property`"""
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.create_property)(request)
+
+    request, error = authenticated_request(request)
+    if error is not None:
+        return error
+    cache_key, entry = await sync_to_async(cached_entry)(list_cache_key, request)
+    if entry is not None:
+        return rendered(request, cached_response(request, entry))
+
+    if request.query_params.get('view') == 'card':
+        queryset, serializer_class = views.property_card_queryset(), PropertyCardSerializer
+    else:
+        queryset, serializer_class = views.property_queryset(), PropertySerializer
+
+    try:
+        properties = filter_properties(queryset, request.query_params)
+        ordering = get_ordering(request.query_params)
+    except FilterError as e:
+        return rendered(request, Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST))
+
+    paginator = KeysetPagination()
+    try:
+        page = await paginator.apaginate_queryset(properties, request, ordering)
+    except NotFound as e:
+        return rendered(request, Response({'detail': e.detail}, status=status.HTTP_404_NOT_FOUND))
+
+    # Owners are select_related and images prefetched, so this runs no queries
+    serializer = serializer_class(page, many=True, context={'request': request})
+    with timing(request, 'serialize'):
+        data = paginator.get_paginated_data(serializer.data)
+    updated_at = max((p.updated_at for p in page), default=None)
+    entry = await sync_to_async(make_entry)(cache_key, data, updated_at, last_modified=False)
+    return rendered(request, cached_response(request, entry))
+
+
+@csrf_exempt
+async def aproperty_detail(request, pk):
+    """GET of one property, or of an archived one; other methods go to `views.property_detail`"""
+    if request.method not in READ_METHODS:
+        return await sync_to_async(views.property_detail)(request, pk)
+
+    request, error = authenticated_request(request)
+    if error is not None:
+        return error
+    cache_key, entry = await sync_to_async(cached_entry)(detail_cache_key, request, pk)
+    if entry is not None:
+        return rendered(request, cached_response(request, entry))
+
+    try:
+        property = await views.property_queryset().aget(pk=pk)
+    except Property.DoesNotExist:
+        response = await sync_to_async(views.archived_detail_response)(request, cache_key, pk)
+        return rendered(request, response)
+
+    serializer = PropertySerializer(property, context={'request': request})
+    with timing(request, 'serialize'):
+        data = serializer.data
+    entry = await sync_to_async(make_entry)(cache_key, data, property.updated_at)
+    return rendered(request, cached_response(request, entry))
+
+
+def login_credentials(data):
+    """
+    (username, password) from a login payload, or (None, error response) when
+    the payload isn't an object or lacks either field
+    """
+    if not isinstance(data, dict):
+        return None, Response(
+            {'error': 'Expected an object with username and password'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    username = data.get('username')
+    password = data.get('password')
+    if not username or not password:
+        return None, Response(
+            {'error': 'Username and password are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return (username, password), None
+
+
+def login_response(user):
+    """Tokens for an authenticated user, or 401 when authentication failed"""
+    if user is None:
+        return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({
+        'user': UserSerializer(user).data,
+        **issue_tokens(user),
+        'message': 'Login successful'
+    })
+
+
+def check_throttles(request):
+    """Wait in seconds if a login throttle refuses the request, else None"""
+    for throttle in (LoginIPThrottle(), LoginAccountThrottle()):
+        if not throttle.allow_request(request, None):
+            return throttle.wait()
+    return None
+
+
+@csrf_exempt
+async def alogin_user(request):
+    """Login with a username (or email) and password, behind the login throttles"""
+    if request.method != 'POST':
+        response = Response(
+            {'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+        response['Allow'] = 'POST'
+        return rendered(request, response)
+
+    request = Request(request, parsers=[JSONParser(), FormParser(), MultiPartParser()])
+    try:
+        data = request.data
+    except Exception as e:
+        return rendered(request, Response({'error': f'Login failed: {e}'}, status=status.HTTP_400_BAD_REQUEST))
+
+    wait = await sync_to_async(check_throttles)(request)
+    if wait is not None:
+        wait = math.ceil(wait or 0)
+        response = Response(
+            {'detail': f'Request was throttled. Expected available in {wait} seconds.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        response['Retry-After'] = str(wait)
+        return rendered(request, response)
+
+    credentials, error = login_credentials(data)
+    if error is not None:
+        return rendered(request, error)
+    username, password = credentials
+    # The backend accepts a username or an email in a single lookup
+    user = await aauthenticate(request._request, username=username, password=password)
+    return rendered(request, login_response(user))
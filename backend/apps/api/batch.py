@@ -0,0 +1,160 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_properties
+from .models import Property
+from .serializer import PropertySerializer, assign_owner
+
+MAX_BATCH_OPERATIONS = 500
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class BatchError(ValueError):
+    """Raised when the batch payload itself is malformed"""
+
+
+def result(index, op, status_code, pk=None, errors=None):
+    item = {'index': index, 'op': op, 'status': status_code}
+    if pk is not None:
+        item['id'] = pk
+    if errors is not None:
+        item['errors'] = errors
+    return item
+
+
+def is_id(value):
+    # bool is an int subclass, but `true` is not property 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_operations(payload):
+    operations = payload.get('operations') if isinstance(payload, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError(f'A batch may contain at most {MAX_BATCH_OPERATIONS} operations')
+    return operations
+
+
+def validate_operations(operations, request):
+    """
+    Validate every operation without writing anything. Returns the planned
+    creates, updates and deletes plus a result for every rejected item.
+    """
+    # One query for every row the batch touches
+    ids = [op.get('id') for op in operations if isinstance(op, dict) and op.get('op') in ('update', 'delete')]
+    existing = Property.objects.in_bulk([pk for pk in ids if is_id(pk)])
+
+    user = request.user
+    creates, updates, deletes, rejected = [], [], [], []
+    seen = set()
+    # (owner id, external_ref) claimed by earlier items; the serializer only
+    # checks against rows already in the database
+    claimed = set()
+
+    def claim(index, op, owner_id, external_ref, pk=None):
+        if not external_ref:
+            return True
+        if (owner_id, external_ref) in claimed:
+            rejected.append(result(index, op, 400, pk=pk, errors={
+                'external_ref': ['Another item in this batch uses this external_ref.'],
+            }))
+            return False
+        claimed.add((owner_id, external_ref))
+        return True
+    for index, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in OPERATIONS:
+            rejected.append(result(index, op, 400, errors={'op': f'Must be one of {", ".join(OPERATIONS)}'}))
+            continue
+
+        if op == 'create':
+            serializer = PropertySerializer(data=operation.get('data') or {}, context={'request': request})
+            if serializer.is_valid():
+                data = assign_owner(serializer.validated_data, request)
+                if claim(index, op, data.get('user_id'), data.get('external_ref')):
+                    creates.append((index, data))
+            else:
+                rejected.append(result(index, op, 400, errors=serializer.errors))
+            continue
+
+        pk = operation.get('id')
+        if not is_id(pk):
+            rejected.append(result(index, op, 400, errors={'id': 'Must be an integer'}))
+            continue
+        instance = existing.get(pk)
+        if instance is None:
+            rejected.append(result(index, op, 404, pk=pk, errors={'id': 'Not found'}))
+            continue
+        if not (user.is_staff or instance.user_id == user.pk):
+            rejected.append(result(index, op, 403, pk=instance.pk, errors={'id': 'You do not own this property'}))
+            continue
+        if instance.pk in seen:
+            rejected.append(result(index, op, 400, pk=instance.pk, errors={'id': 'Appears more than once in the batch'}))
+            continue
+        seen.add(instance.pk)
+
+        if op == 'delete':
+            deletes.append((index, instance.pk))
+            continue
+
+        serializer = PropertySerializer(
+            instance, data=operation.get('data') or {}, partial=True, context={'request': request}
+        )
+        if serializer.is_valid():
+            changes = dict(serializer.validated_data)
+            changes.pop('uploaded_images', None)
+            if not user.is_staff:
+                changes.pop('user', None)
+            owner_id = changes['user'].pk if changes.get('user') is not None else instance.user_id
+            if claim(index, op, owner_id, changes.get('external_ref', instance.external_ref), pk=instance.pk):
+                updates.append((index, instance.pk, changes))
+        else:
+            rejected.append(result(index, op, 400, pk=instance.pk, errors=serializer.errors))
+
+    return creates, updates, deletes, rejected
+
+
+def apply_operations(creates, updates, deletes):
+    """
+    Apply validated operations in one transaction with as few statements as
+    possible: one INSERT for all creates, one UPDATE per distinct change set
+    (marking 200 listings rented is a single statement) and one soft delete.
+    """
+    results = []
+    touched = []
+    with transaction.atomic():
+        if creates:
+            objects = []
+            for _, data in creates:
+                data = dict(data)
+                data.pop('uploaded_images', None)
+                objects.append(Property(**data))
+            Property.objects.bulk_create(objects)
+            for (index, _), obj in zip(creates, objects):
+                results.append(result(index, 'create', 201, pk=obj.pk))
+                touched.append(obj.pk)
+
+        groups = defaultdict(list)
+        for index, pk, changes in updates:
+            groups[tuple(sorted(changes.items()))].append((index, pk))
+        now = timezone.now()
+        for changes, items in groups.items():
+            pks = [pk for _, pk in items]
+            # .update() bypasses auto_now, so bump updated_at explicitly
+            Property.objects.filter(pk__in=pks).update(**dict(changes), updated_at=now)
+            results.extend(result(index, 'update', 200, pk=pk) for index, pk in items)
+            touched.extend(pks)
+
+        if deletes:
+            pks = [pk for _, pk in deletes]
+            Property.objects.filter(pk__in=pks).soft_delete()
+            results.extend(result(index, 'delete', 204, pk=pk) for index, pk in deletes)
+            touched.extend(pks)
+
+        # Bulk writes skip post_save
+        if touched:
+            invalidate_properties(touched)
+    return results
@@ -0,0 +1,140 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .replicas import max_lag, read_from_replica, replica_aliases
+
+# Cached responses never outlive this, even if an invalidation is missed
+# (e.g. an owner renaming themselves changes the embedded user data).
+RESPONSE_CACHE_TIMEOUT = 600
+
+LIST_VERSION_KEY = 'property-list-version'
+# When a listing was last written, for entries built from replica reads
+LAST_WRITE_KEY = 'property-last-write'
+
+
+def detail_version_key(pk):
+    return f'property-detail-version:{pk}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version never falls back to a
+        # number that older entries were written under
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def record_write():
+    if replica_aliases():
+        cache.set(LAST_WRITE_KEY, time.time(), RESPONSE_CACHE_TIMEOUT)
+
+
+def invalidate_property(pk):
+    """
+    Invalidate cached lists and the cached detail for one property. The bump
+    is repeated after commit so a reader that cached the pre-commit state
+    under the new version is invalidated as well.
+    """
+    def bump():
+        record_write()
+        bump_version(LIST_VERSION_KEY)
+        if pk is not None:
+            bump_version(detail_version_key(pk))
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_properties(pks):
+    """
+    Bulk variant of `invalidate_property` for writes that bypass signals.
+    Dropping the detail version keys re-seeds them on next read.
+    """
+    keys = [detail_version_key(pk) for pk in pks]
+
+    def bump():
+        record_write()
+        bump_version(LIST_VERSION_KEY)
+        cache.delete_many(keys)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def normalized_params(params, exclude=()):
+    items = sorted((key, sorted(values)) for key, values in params.lists() if key not in exclude)
+    return hashlib.md5(repr(items).encode()).hexdigest()
+
+
+def list_cache_key(request):
+    # Serialized data holds absolute image URLs, so the host is part of the key
+    return 'property-list:{}:{}:{}'.format(
+        get_version(LIST_VERSION_KEY),
+        request.build_absolute_uri('/'),
+        normalized_params(request.query_params),
+    )
+
+
+def detail_cache_key(request, pk):
+    return 'property-detail:{}:{}:{}'.format(
+        pk,
+        get_version(detail_version_key(pk)),
+        request.build_absolute_uri('/'),
+    )
+
+
+def cached_response(request, entry):
+    """
+    Build a response from a cache entry ({'data', 'etag', 'updated_at'}),
+    answering 304 when the client's validators still match.
+    """
+    last_modified = None
+    response = Response(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Cache-Control'] = 'no-cache'
+    if entry['updated_at'] is not None:
+        last_modified = int(entry['updated_at'].timestamp())
+        response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=last_modified, response=response
+    )
+
+
+def entry_timeout():
+    """
+    A replica that hasn't replayed a write yet can return pre-write data,
+    which would be cached under the version the write bumped. Entries read
+    from a replica within the allowed lag of a write are kept only that long.
+    """
+    if read_from_replica():
+        written = cache.get(LAST_WRITE_KEY)
+        if written is not None and time.time() - written < max_lag():
+            return max_lag()
+    return RESPONSE_CACHE_TIMEOUT
+
+
+def make_entry(key, data, updated_at, last_modified=True):
+    """
+    Cache `data` under `key`. With `last_modified=False` the entry is only
+    validated by its ETag: a list's newest `updated_at` doesn't move when a
+    listing drops out of it, so it can't answer If-Modified-Since.
+    """
+    etag = '"{}"'.format(hashlib.md5(f'{key}:{updated_at}'.encode()).hexdigest())
+    entry = {'data': data, 'etag': etag, 'updated_at': updated_at if last_modified else None}
+    cache.set(key, entry, entry_timeout())
+    return entry
@@ -0,0 +1,106 @@
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, Max, Min
+from django.db.models.functions import Cast, Floor
+
+from .caching import LIST_VERSION_KEY, get_version, normalized_params
+
+# Tiles form a plain lat/lng grid: at zoom z a tile is 360 / 2**z degrees wide.
+# Each tile is split into CELLS_PER_TILE x CELLS_PER_TILE clustering cells.
+CELLS_PER_TILE = 4
+MAX_ZOOM = 20
+MAX_TILES = 256
+CLUSTER_CACHE_TIMEOUT = 300
+
+# Parameters that describe the viewport rather than the filter set
+VIEWPORT_PARAMS = ('bbox', 'zoom', 'cursor', 'page_size', 'ordering', 'view')
+
+
+def tile_size(zoom):
+    return 360.0 / (2 ** zoom)
+
+
+def tiles_for_bbox(zoom, min_lng, min_lat, max_lng, max_lat):
+    """
+    Return the (x, y) tiles covering the bounding box. Raises ValueError,
+    before listing any, if there are more than MAX_TILES of them.
+    """
+    size = tile_size(zoom)
+    x_range = range(math.floor((min_lng + 180) / size), math.floor((max_lng + 180) / size) + 1)
+    y_range = range(math.floor((min_lat + 90) / size), math.floor((max_lat + 90) / size) + 1)
+    if len(x_range) * len(y_range) > MAX_TILES:
+        raise ValueError('Bounding box covers too many tiles for this zoom level')
+    return [(x, y) for x in x_range for y in y_range]
+
+
+def tile_cache_key(version, fingerprint, zoom, x, y):
+    return f'property-clusters:{version}:{fingerprint}:{zoom}:{x}:{y}'
+
+
+def compute_clusters(queryset, zoom, tiles):
+    """
+    Group properties inside `tiles` into grid cells with one aggregate query.
+    Returns a dict mapping every requested tile to its list of clusters.
+    """
+    size = tile_size(zoom)
+    cell = size / CELLS_PER_TILE
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+
+    rows = (
+        queryset
+        .filter(
+            longitude__gte=min(xs) * size - 180, longitude__lt=(max(xs) + 1) * size - 180,
+            latitude__gte=min(ys) * size - 90, latitude__lt=(max(ys) + 1) * size - 90,
+        )
+        .annotate(
+            cell_x=Floor((Cast('longitude', FloatField()) + 180) / cell),
+            cell_y=Floor((Cast('latitude', FloatField()) + 90) / cell),
+        )
+        .order_by()
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('id'),
+            center_lat=Avg(Cast('latitude', FloatField())),
+            center_lng=Avg(Cast('longitude', FloatField())),
+            min_price=Min('price'),
+            max_price=Max('price'),
+        )
+    )
+
+    clusters = {tile: [] for tile in tiles}
+    for row in rows:
+        tile = (int(row['cell_x']) // CELLS_PER_TILE, int(row['cell_y']) // CELLS_PER_TILE)
+        if tile not in clusters:
+            continue
+        clusters[tile].append({
+            'latitude': round(row['center_lat'], 6),
+            'longitude': round(row['center_lng'], 6),
+            'count': row['count'],
+            'min_price': str(row['min_price']),
+            'max_price': str(row['max_price']),
+        })
+    return clusters
+
+
+def get_clusters(queryset, params, zoom, bbox):
+    """
+    Clusters for the tiles covering `bbox`. Each tile is cached separately,
+    so panning only computes the tiles that just came into view.
+    """
+    tiles = tiles_for_bbox(zoom, *bbox)
+
+    # Listing writes bump the list version, which retires every cached tile
+    version = get_version(LIST_VERSION_KEY)
+    fingerprint = normalized_params(params, exclude=VIEWPORT_PARAMS)
+    keys = {tile: tile_cache_key(version, fingerprint, zoom, *tile) for tile in tiles}
+    cached = cache.get_many(keys.values())
+
+    missing = [tile for tile in tiles if keys[tile] not in cached]
+    if missing:
+        computed = compute_clusters(queryset, zoom, missing)
+        cache.set_many({keys[tile]: computed[tile] for tile in missing}, CLUSTER_CACHE_TIMEOUT)
+        cached.update({keys[tile]: computed[tile] for tile in missing})
+
+    return [cluster for tile in tiles for cluster in cached[keys[tile]]]
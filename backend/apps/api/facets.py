@@ -0,0 +1,136 @@
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import BooleanField, Case, ExpressionWrapper, IntegerField, Value, When
+
+from .caching import LIST_VERSION_KEY, get_version, normalized_params
+from .filters import field_conditions, filter_properties
+from .models import Property
+
+FACET_CACHE_TIMEOUT = 300
+
+# Lower bounds of the buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 500_000, 1_000_000, 2_000_000, 5_000_000)
+BEDROOM_BUCKETS = (0, 1, 2, 3, 4, 5)
+
+# facet name -> column of the grouped subquery
+FACET_COLUMNS = {
+    'city': 'city',
+    'property_type': 'property_type',
+    'status': 'status',
+    'furnished': 'furnished',
+    'price': 'price_bucket',
+    'bedrooms': 'bedrooms_bucket',
+}
+
+# Parameters that page or render the listing without changing the filter set
+IGNORED_PARAMS = ('cursor', 'page_size', 'ordering', 'view')
+
+
+def bucket(field, bounds):
+    """Index of the bucket in `bounds` that the field's value falls into"""
+    return Case(
+        *[When(**{f'{field}__gte': bound}, then=Value(i)) for i, bound in reversed(list(enumerate(bounds)))],
+        output_field=IntegerField(),
+    )
+
+
+def compute_facets(queryset, conditions):
+    """
+    Count listings per facet value with one GROUPING SETS query. Each
+    facet's counts apply every filter except its own, so picking a city
+    still shows how many listings the other cities have. `queryset` carries
+    the filters that aren't facets; `conditions` maps facets to theirs.
+    """
+    matches = {
+        f'match_{facet}': ExpressionWrapper(conditions[facet], output_field=BooleanField())
+        if facet in conditions else Value(True)
+        for facet in FACET_COLUMNS
+    }
+    inner = (
+        queryset.order_by()
+        .annotate(
+            price_bucket=bucket('price', PRICE_BUCKETS),
+            bedrooms_bucket=bucket('bedrooms', BEDROOM_BUCKETS),
+            **matches,
+        )
+        .values(*FACET_COLUMNS.values(), *matches)
+    )
+    connection = connections[queryset.db]
+    sql, params = inner.query.get_compiler(connection=connection).as_sql()
+
+    quote = connection.ops.quote_name
+    columns = [quote(column) for column in FACET_COLUMNS.values()]
+
+    def matching(*facets):
+        return ' AND '.join(quote(f'match_{facet}') for facet in facets)
+
+    counts = [
+        f'COUNT(*) FILTER (WHERE {matching(*(other for other in FACET_COLUMNS if other != facet))})'
+        for facet in FACET_COLUMNS
+    ]
+    query = (
+        f'SELECT {", ".join(columns)}, '
+        f'{", ".join(f"GROUPING({column})" for column in columns)}, '
+        f'{", ".join(counts)}, COUNT(*) FILTER (WHERE {matching(*FACET_COLUMNS)}) '
+        f'FROM ({sql}) AS listing '
+        f'GROUP BY GROUPING SETS ({", ".join(f"({column})" for column in columns)}, ())'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+    size = len(FACET_COLUMNS)
+    facets = {facet: {} for facet in FACET_COLUMNS}
+    total = 0
+    for row in rows:
+        values, grouping, facet_counts = row[:size], row[size:2 * size], row[2 * size:3 * size]
+        if all(grouping):
+            total = row[-1]
+            continue
+        index = grouping.index(0)
+        if facet_counts[index]:
+            facets[list(FACET_COLUMNS)[index]][values[index]] = facet_counts[index]
+    return format_facets(facets, total)
+
+
+def format_facets(facets, total):
+    def ranked(counts, labels=None):
+        options = [
+            {'value': value, **({'label': labels.get(value, value)} if labels else {}), 'count': count}
+            for value, count in counts.items()
+        ]
+        return sorted(options, key=lambda option: (-option['count'], str(option['value'])))
+
+    def buckets(counts, bounds):
+        return [
+            {'min': bound, 'max': bounds[i + 1] if i + 1 < len(bounds) else None, 'count': counts[i]}
+            for i, bound in enumerate(bounds) if counts.get(i)
+        ]
+
+    return {
+        'total': total,
+        'city': ranked(facets['city']),
+        'property_type': ranked(facets['property_type'], dict(Property.PROPERTY_TYPE_CHOICES)),
+        'status': ranked(facets['status'], dict(Property.STATUS_CHOICES)),
+        'furnished': ranked(facets['furnished']),
+        'price': buckets(facets['price'], PRICE_BUCKETS),
+        'bedrooms': buckets(facets['bedrooms'], BEDROOM_BUCKETS),
+    }
+
+
+def get_facets(queryset, params):
+    """
+    Facet counts for the listing filters in `params`, cached until the next
+    listing write bumps the list version. Raises FilterError for bad params.
+    """
+    conditions = field_conditions(params)
+    queryset = filter_properties(queryset, params, exclude_fields=FACET_COLUMNS)
+
+    key = 'property-facets:{}:{}'.format(
+        get_version(LIST_VERSION_KEY), normalized_params(params, exclude=IGNORED_PARAMS)
+    )
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset, {facet: conditions[facet] for facet in FACET_COLUMNS if facet in conditions})
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,60 @@
+import csv
+import json
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f'Cannot infer the format of {path}; pass --format')
+
+
+def read_rows(f, fmt):
+    """Yield (line number, row dict) without loading the whole feed"""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            # Empty CSV cells mean "not provided"
+            yield reader.line_num, {key: value for key, value in row.items() if value != ''}
+    else:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RowWriter:
+    def __init__(self, f, fmt, fields):
+        self.f = f
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(f, fieldnames=fields)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.f.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
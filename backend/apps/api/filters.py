@@ -0,0 +1,229 @@
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+from .models import Property
+
+# Maps the `ordering` query parameter to the model fields used for sorting.
+# Every ordering ends with `id` so that keyset pagination has a unique key.
+ORDERING_CHOICES = {
+    'newest': ('-published_at', '-id'),
+    'oldest': ('published_at', 'id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+    'surface_low': ('surface_area', 'id'),
+    'surface_high': ('-surface_area', '-id'),
+    # Only available together with `q`, which annotates the rank
+    'relevance': ('-rank', '-id'),
+    # Only available together with `near`, which annotates the distance
+    'distance': ('distance_km', 'id'),
+}
+DEFAULT_ORDERING = 'newest'
+DEFAULT_SEARCH_ORDERING = 'relevance'
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LATITUDE = 111.045
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+# query parameter -> (model lookup, parser)
+RANGE_FILTERS = {
+    'min_price': ('price__gte', Decimal),
+    'max_price': ('price__lte', Decimal),
+    'min_surface': ('surface_area__gte', int),
+    'max_surface': ('surface_area__lte', int),
+    'min_bedrooms': ('bedrooms__gte', int),
+    'max_bedrooms': ('bedrooms__lte', int),
+    'bedrooms': ('bedrooms__gte', int),
+    'bathrooms': ('bathrooms__gte', int),
+}
+
+
+class FilterError(ValueError):
+    """Raised when a query parameter cannot be parsed"""
+
+
+def parse_bool(value):
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def parse_coordinates(value, count):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise ValueError(value)
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        raise ValueError(value)
+    return numbers
+
+
+def parse_bbox(value):
+    """min_lng,min_lat,max_lng,max_lat as floats; ValueError unless it's an ordered box on the globe"""
+    min_lng, min_lat, max_lng, max_lat = parse_coordinates(value, 4)
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError(value)
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def filter_bbox(queryset, min_lng, min_lat, max_lng, max_lat):
+    """Restrict to a lat/lng box; served by the (latitude, longitude) index"""
+    return queryset.filter(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lng, longitude__lte=max_lng,
+    )
+
+
+def filter_near(queryset, lat, lng, radius_km):
+    """
+    Properties within `radius_km` of a point, annotated with `distance_km`.
+    A bounding box around the circle narrows the rows through the index
+    before the exact haversine distance is computed for the survivors.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    lng_delta = radius_km / (KM_PER_DEGREE_LATITUDE * max(math.cos(math.radians(lat)), 0.01))
+    queryset = filter_bbox(queryset, lng - lng_delta, lat - lat_delta, lng + lng_delta, lat + lat_delta)
+
+    lat_rad = math.radians(lat)
+    half_dlat = (Radians('latitude') - lat_rad) / 2
+    half_dlng = (Radians('longitude') - math.radians(lng)) / 2
+    haversine = Power(Sin(half_dlat), 2) + math.cos(lat_rad) * Cos(Radians('latitude')) * Power(Sin(half_dlng), 2)
+    distance = 2 * EARTH_RADIUS_KM * ASin(Sqrt(haversine))
+    return queryset.annotate(
+        distance_km=Cast(distance, FloatField())
+    ).filter(distance_km__lte=radius_km)
+
+
+def search_properties(queryset, text):
+    """
+    Full-text search against the trigger-maintained `search_vector` column.
+    The query goes through the same `unaccent` + 'simple' pipeline as the
+    document, so "fes" matches "Fès". Matches are annotated with `rank`.
+    """
+    query = SearchQuery(
+        Func(Value(text), function='unaccent'),
+        config='simple',
+        search_type='websearch',
+    )
+    # ts_rank returns a float4; widen it so the value round-trips exactly
+    # through keyset cursors
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+
+
+def field_conditions(params):
+    """
+    The plain column filters in `params` as Q objects, keyed by the field
+    they constrain (several range parameters can constrain one field)
+    """
+    conditions = {}
+
+    city = params.get('city')
+    if city:
+        conditions['city'] = Q(city=city.strip())
+
+    property_types = [t for t in params.getlist('property_type') if t]
+    if property_types:
+        valid_types = dict(Property.PROPERTY_TYPE_CHOICES)
+        for property_type in property_types:
+            if property_type not in valid_types:
+                raise FilterError(f'Invalid property_type: {property_type}')
+        conditions['property_type'] = Q(property_type__in=property_types)
+
+    property_status = params.get('status')
+    if property_status:
+        if property_status not in dict(Property.STATUS_CHOICES):
+            raise FilterError(f'Invalid status: {property_status}')
+        conditions['status'] = Q(status=property_status)
+
+    for param, (lookup, parser) in RANGE_FILTERS.items():
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            value = parser(value)
+        except (ValueError, InvalidOperation):
+            raise FilterError(f'Invalid value for {param}: {value}')
+        field = lookup.split('__')[0]
+        conditions[field] = conditions.get(field, Q()) & Q(**{lookup: value})
+
+    for param in ('furnished', 'is_active'):
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            conditions[param] = Q(**{param: parse_bool(value)})
+        except ValueError:
+            raise FilterError(f'Invalid value for {param}: {value}')
+
+    return conditions
+
+
+def filter_properties(queryset, params, exclude_fields=()):
+    """
+    Apply the listing query parameters to a Property queryset. Column
+    filters on `exclude_fields` are validated but not applied.
+    """
+    text = params.get('q', '').strip()
+    if text:
+        queryset = search_properties(queryset, text)
+
+    user_id = params.get('user')
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+
+    conditions = field_conditions(params)
+    queryset = queryset.filter(*(q for field, q in conditions.items() if field not in exclude_fields))
+
+    bbox = params.get('bbox')
+    if bbox:
+        try:
+            min_lng, min_lat, max_lng, max_lat = parse_bbox(bbox)
+        except ValueError:
+            raise FilterError('bbox must be min_lng,min_lat,max_lng,max_lat')
+        queryset = filter_bbox(queryset, min_lng, min_lat, max_lng, max_lat)
+
+    near = params.get('near')
+    if near:
+        try:
+            lat, lng = parse_coordinates(near, 2)
+        except ValueError:
+            raise FilterError('near must be lat,lng')
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise FilterError('near must be lat,lng')
+        try:
+            radius_km = float(params.get('radius_km') or DEFAULT_RADIUS_KM)
+        except ValueError:
+            raise FilterError(f'Invalid value for radius_km: {params.get("radius_km")}')
+        if not 0 < radius_km <= MAX_RADIUS_KM:
+            raise FilterError(f'radius_km must be between 0 and {MAX_RADIUS_KM}')
+        queryset = filter_near(queryset, lat, lng, radius_km)
+
+    # Public browsing only shows active listings (and matches the partial
+    # indexes); an owner's page lists everything unless asked otherwise
+    if params.get('is_active') in (None, '') and not user_id:
+        queryset = queryset.filter(is_active=True)
+
+    return queryset
+
+
+def get_ordering(params):
+    """Return the ordering fields requested by the `ordering` parameter"""
+    searching = bool(params.get('q', '').strip())
+    ordering = params.get('ordering') or (DEFAULT_SEARCH_ORDERING if searching else DEFAULT_ORDERING)
+    if (ordering not in ORDERING_CHOICES
+            or (ordering == 'relevance' and not searching)
+            or (ordering == 'distance' and not params.get('near'))):
+        raise FilterError(f'Invalid ordering: {ordering}')
+    return ORDERING_CHOICES[ordering]
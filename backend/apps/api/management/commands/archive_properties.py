@@ -0,0 +1,37 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.api.archive import ARCHIVE_BATCH_SIZE, archive_properties
+
+
+class Command(BaseCommand):
+    help = (
+        'Purge soft-deleted properties past their retention and move sold, '
+        'rented or inactive properties untouched for a while into the archive; '
+        'meant to be run from cron daily'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--after-days', type=float,
+            help='Archive closed properties untouched this long (default PROPERTY_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--retention-days', type=float,
+            help='Purge soft-deleted properties after this long (default PROPERTY_DELETED_RETENTION_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        def days(option):
+            return None if options[option] is None else timedelta(days=options[option])
+
+        started = time.perf_counter()
+        purged, archived = archive_properties(
+            after=days('after_days'), retention=days('retention_days'), batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} deleted and archived {archived} properties in {time.perf_counter() - started:.2f}s'
+        ))
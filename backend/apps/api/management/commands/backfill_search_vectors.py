@@ -0,0 +1,44 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.core.management.base import BaseCommand
+from django.db.models import F, Func
+
+from apps.api.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Fill Property.search_vector for rows written before the search trigger existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild every row instead of only rows with an empty vector',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Property.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        # Same SQL function the trigger uses, so both paths build identical documents
+        vector = Func(
+            F('title'), F('description'), F('city'), F('address'),
+            function='api_property_search_vector',
+            output_field=SearchVectorField(),
+        )
+
+        # Walk the primary key in batches to keep each UPDATE short
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            updated += Property.objects.filter(pk__in=pks).update(search_vector=vector)
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Updated search vectors for {updated} properties'))
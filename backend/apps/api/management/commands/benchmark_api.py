@@ -0,0 +1,199 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from apps.api.models import Property
+from apps.users.models import User
+from apps.users.tokens import issue_tokens
+
+BENCH_USERNAME = 'api-benchmark'
+BENCH_PASSWORD = 'api-benchmark-password'
+
+CREATE_PAYLOAD = {
+    'title': 'Benchmark apartment',
+    'description': 'Created by benchmark_api',
+    'price': '950000.00',
+    'surface_area': 85,
+    'rooms': 3,
+    'bedrooms': 2,
+    'bathrooms': 1,
+    'property_type': 'apartment',
+    'status': 'for_sale',
+    'city': 'Casablanca',
+    'address': '12 Boulevard Anfa',
+    'is_active': True,
+}
+
+
+class QueryCounter:
+    """execute_wrapper that only counts, so timings aren't skewed by query logging"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def summarize(values):
+    ordered = sorted(values)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method='inclusive')
+        p50, p90, p95, p99 = cuts[49], cuts[89], cuts[94], cuts[98]
+    else:
+        p50 = p90 = p95 = p99 = ordered[0]
+    return {
+        'p50': round(p50, 3), 'p90': round(p90, 3), 'p95': round(p95, 3), 'p99': round(p99, 3),
+        'mean': round(statistics.fmean(ordered), 3),
+        'min': round(ordered[0], 3), 'max': round(ordered[-1], 3),
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=settings.BASE_DIR,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency percentiles, query counts and response sizes of the list, '
+        'detail, create and login endpoints and write a JSON report'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout ('-')")
+        parser.add_argument('--compare', help='Earlier report to print p50/p95 deltas against')
+        parser.add_argument('--label', default='', help='Free text stored in the report')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        detail = Property.objects.filter(is_active=True).order_by('-published_at', '-id').first()
+        if detail is None:
+            raise CommandError('No properties to benchmark; run seed_properties first')
+
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'email': ''})
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host]
+        self.client = Client(HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_tokens(user)["token"]}'}
+
+        try:
+            report = self.run_scenarios(detail.pk, options['iterations'], options['warmup'])
+        finally:
+            # Cascades to the properties created by the `create` scenario
+            user.delete()
+
+        report = {
+            'meta': {
+                'label': options['label'],
+                'commit': git_commit(),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'properties': Property.objects.count(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'scenarios': report,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output'] and options['output'] != '-':
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.print_comparison(json.load(f), report)
+
+    def scenarios(self, detail_id):
+        """name -> (request callable, whether the response cache is cleared before each call)"""
+        list_url = '/api/properties/'
+        return {
+            'list': (lambda: self.client.get(list_url), True),
+            'list_cached': (lambda: self.client.get(list_url), False),
+            'list_card': (lambda: self.client.get(list_url, {'view': 'card'}), True),
+            'list_filtered': (lambda: self.client.get(list_url, {
+                'city': 'Casablanca', 'property_type': 'apartment', 'ordering': 'price_low',
+            }), True),
+            'detail': (lambda: self.client.get(f'{list_url}{detail_id}/'), True),
+            'detail_cached': (lambda: self.client.get(f'{list_url}{detail_id}/'), False),
+            'create': (lambda: self.client.post(
+                list_url, CREATE_PAYLOAD, content_type='application/json', **self.auth
+            ), False),
+            # Clearing the cache also resets the login throttles between calls
+            'login': (lambda: self.client.post(
+                '/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD},
+                content_type='application/json',
+            ), True),
+        }
+
+    def run_scenarios(self, detail_id, iterations, warmup):
+        results = {}
+        for name, (call, cold) in self.scenarios(detail_id).items():
+            latencies, queries, sizes = [], [], []
+            for i in range(warmup + iterations):
+                if cold:
+                    cache.clear()
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    response = call()
+                    elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code >= 400:
+                    raise CommandError(f'{name} returned HTTP {response.status_code}')
+                if i < warmup:
+                    continue
+                latencies.append(elapsed)
+                queries.append(counter.count)
+                sizes.append(len(response.content))
+            results[name] = {
+                'latency_ms': summarize(latencies),
+                'queries': {'min': min(queries), 'max': max(queries), 'mean': round(statistics.fmean(queries), 2)},
+                'bytes': {'min': min(sizes), 'max': max(sizes), 'median': statistics.median(sizes)},
+                'status': response.status_code,
+            }
+            self.stderr.write(
+                f"{name:<15} p50 {results[name]['latency_ms']['p50']:>8.2f} ms  "
+                f"p95 {results[name]['latency_ms']['p95']:>8.2f} ms  "
+                f"{results[name]['queries']['max']:>3} queries  {results[name]['bytes']['median']:>8} bytes"
+            )
+        return results
+
+    def print_comparison(self, baseline, report):
+        self.stderr.write(f"\nCompared with {baseline['meta'].get('commit') or baseline['meta'].get('label')}:")
+        for name, current in report['scenarios'].items():
+            previous = baseline['scenarios'].get(name)
+            if previous is None:
+                continue
+            deltas = []
+            for key in ('p50', 'p95'):
+                before, after = previous['latency_ms'][key], current['latency_ms'][key]
+                change = (after - before) / before * 100 if before else 0.0
+                deltas.append(f'{key} {before:.2f} -> {after:.2f} ms ({change:+.1f}%)')
+            queries = f"queries {previous['queries']['max']} -> {current['queries']['max']}"
+            self.stderr.write(f"{name:<15} {'  '.join(deltas)}  {queries}")
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_api import summarize
+
+
+async def http_request(host, port, method, path, headers=(), body=b'', trickle=None, timeout=60):
+    """
+    Minimal HTTP/1.1 client on raw asyncio streams. With `trickle` as
+    (chunk_bytes, interval_seconds) the request is written and the response
+    read at that pace, like a client on a very slow link.
+    Returns (status, response bytes).
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        head = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close', *headers]
+        if body:
+            head.append(f'Content-Length: {len(body)}')
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode() + body
+
+        if trickle is None:
+            writer.write(payload)
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), timeout)
+        else:
+            size, interval = trickle
+            for offset in range(0, len(payload), size):
+                writer.write(payload[offset:offset + size])
+                await writer.drain()
+                await asyncio.sleep(interval)
+            data = b''
+            while True:
+                chunk = await asyncio.wait_for(reader.read(size), timeout)
+                if not chunk:
+                    break
+                data += chunk
+                await asyncio.sleep(interval)
+    finally:
+        writer.close()
+
+    status_line = data.split(b'\r\n', 1)[0].split()
+    if len(status_line) < 2:
+        raise ConnectionError('Malformed response')
+    return int(status_line[1]), len(data)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare servers (e.g. gunicorn on core.wsgi vs uvicorn on core.asgi) by '
+        'measuring fast-client throughput and latency while slow clients trickle '
+        'requests and read responses at a crawl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='Server to measure, e.g. wsgi=http://127.0.0.1:8001 (repeatable)',
+        )
+        parser.add_argument('--path', default='/api/properties/?view=card', help='Path the fast clients request')
+        parser.add_argument('--slow-path', default='/api/properties/', help='Path the slow clients request')
+        parser.add_argument('--fast-clients', type=int, default=20)
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument('--slow-chunk', type=int, default=64, help='Bytes per write/read for slow clients')
+        parser.add_argument('--slow-interval', type=float, default=0.1, help='Seconds between slow chunks')
+        parser.add_argument('--slow-padding', type=int, default=2048, help='Extra header bytes slow clients send')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run each target')
+        parser.add_argument('--output', help="Write the JSON report here instead of stdout ('-')")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            parts = urlsplit(url)
+            if not name or parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f'Invalid --target {target!r}; expected NAME=http://host:port')
+            targets.append((name, parts.hostname, parts.port or 80))
+
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'settings': {key: options[key] for key in (
+                'path', 'slow_path', 'fast_clients', 'slow_clients', 'slow_chunk',
+                'slow_interval', 'slow_padding', 'duration',
+            )},
+            'targets': {},
+        }
+        for name, host, port in targets:
+            result = asyncio.run(self.run_target(host, port, options))
+            report['targets'][name] = result
+            fast = result['fast']
+            self.stderr.write(
+                f"{name:<8} {fast['requests_per_second']:>8.1f} req/s  "
+                f"p50 {fast['latency_ms']['p50'] if fast['latency_ms'] else '-'} ms  "
+                f"p99 {fast['latency_ms']['p99'] if fast['latency_ms'] else '-'} ms  "
+                f"{fast['errors']} errors, {result['slow']['completed']} slow requests completed"
+            )
+
+        output = json.dumps(report, indent=2)
+        if options['output'] and options['output'] != '-':
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    async def run_target(self, host, port, options):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + options['duration']
+        latencies, statuses, errors = [], Counter(), Counter()
+        slow = Counter()
+
+        async def fast_client():
+            while loop.time() < deadline:
+                started = time.perf_counter()
+                try:
+                    status, _ = await http_request(host, port, 'GET', options['path'])
+                except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+                    errors[type(e).__name__] += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] += 1
+
+        async def slow_client():
+            padding = f"X-Padding: {'x' * options['slow_padding']}"
+            trickle = (options['slow_chunk'], options['slow_interval'])
+            while loop.time() < deadline:
+                try:
+                    await http_request(host, port, 'GET', options['slow_path'], headers=[padding], trickle=trickle)
+                except (OSError, asyncio.TimeoutError, ConnectionError):
+                    slow['errors'] += 1
+                else:
+                    slow['completed'] += 1
+
+        # Slow clients start first so they already hold connections
+        tasks = [asyncio.create_task(slow_client()) for _ in range(options['slow_clients'])]
+        await asyncio.sleep(min(1.0, options['duration'] / 10))
+        started = loop.time()
+        tasks += [asyncio.create_task(fast_client()) for _ in range(options['fast_clients'])]
+        await asyncio.gather(*tasks[options['slow_clients']:])
+        elapsed = loop.time() - started
+        # Slow requests still in flight at the deadline are abandoned
+        for task in tasks[:options['slow_clients']]:
+            task.cancel()
+        await asyncio.gather(*tasks[:options['slow_clients']], return_exceptions=True)
+
+        return {
+            'fast': {
+                'requests': len(latencies),
+                'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                'latency_ms': summarize(latencies) if latencies else None,
+                'statuses': {str(code): count for code, count in sorted(statuses.items())},
+                'errors': sum(errors.values()),
+                'error_types': dict(errors),
+            },
+            'slow': {'completed': slow['completed'], 'errors': slow['errors']},
+        }
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.api.caching import invalidate_properties
+from apps.api.models import Property, PropertyImage
+
+
+def expected_image_summary():
+    """What `cover_image` and `image_count` should hold, as subqueries on Property"""
+    images = PropertyImage.objects.filter(property=OuterRef('pk'))
+    cover = images.order_by(*PropertyImage._meta.ordering, 'pk').values('pk')[:1]
+    count = images.order_by().values('property').annotate(total=Count('pk')).values('total')
+    return {'expected_cover': Subquery(cover), 'expected_count': Coalesce(Subquery(count), 0)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the denormalized cover_image and image_count of every property '
+        'with its images, and with --repair rewrite the ones that differ'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Fix the properties that are out of sync')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--show', type=int, default=20, help='How many out-of-sync ids to list')
+
+    def handle(self, *args, **options):
+        summary = expected_image_summary()
+        out_of_sync = list(
+            Property.objects.annotate(
+                **summary,
+                # 0 stands in for "no cover" so NULLs compare equal
+                cover_key=Coalesce('cover_image', 0),
+                expected_cover_key=Coalesce(summary['expected_cover'], 0),
+            )
+            .filter(~Q(image_count=F('expected_count')) | ~Q(cover_key=F('expected_cover_key')))
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        if not out_of_sync:
+            self.stdout.write(self.style.SUCCESS('All properties are in sync with their images'))
+            return
+
+        shown = ', '.join(str(pk) for pk in out_of_sync[:options['show']])
+        more = '' if len(out_of_sync) <= options['show'] else ', ...'
+        self.stdout.write(f'{len(out_of_sync)} properties out of sync: {shown}{more}')
+        if not options['repair']:
+            return
+
+        for i in range(0, len(out_of_sync), options['batch_size']):
+            batch = out_of_sync[i:i + options['batch_size']]
+            with transaction.atomic():
+                Property.objects.filter(pk__in=batch).update(
+                    cover_image=summary['expected_cover'], image_count=summary['expected_count']
+                )
+                invalidate_properties(batch)
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(out_of_sync)} properties'))
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.api.caching import invalidate_property
+from apps.api.models import PropertyImage
+from apps.api.storage import BLOB_DIR, add_reference, collect_garbage, image_storage
+from apps.api.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount references to stored image files and delete the ones no '
+        'property uses any more. With --adopt, images stored before content '
+        'addressing are first moved into the deduplicated store.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=float,
+            help='Keep unreferenced files stored this recently (default IMAGE_BLOB_GRACE_SECONDS)',
+        )
+        parser.add_argument('--adopt', action='store_true', help='Move images saved under their upload names into the store')
+
+    def handle(self, *args, **options):
+        if options['adopt']:
+            adopted, missing = self.adopt()
+            self.stdout.write(f'Adopted {adopted} images ({missing} files missing)')
+
+        grace = None if options['grace_minutes'] is None else timedelta(minutes=options['grace_minutes'])
+        collected = collect_garbage(grace)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {len(collected)} unreferenced image files'))
+
+    def adopt(self):
+        storage = image_storage()
+        adopted = missing = 0
+        legacy = PropertyImage.objects.exclude(image__startswith=f'{BLOB_DIR}/').exclude(image='')
+        for image in legacy.iterator():
+            old_name, old_thumbnails = image.image.name, image.thumbnails
+            if not storage.exists(old_name):
+                missing += 1
+                continue
+            with storage.open(old_name, 'rb') as f:
+                name = storage.save(old_name, f)
+            # update() skips the signals, so count the reference here
+            PropertyImage.objects.filter(pk=image.pk).update(image=name, thumbnails={})
+            add_reference(name)
+            generate_thumbnails(image.pk)
+            invalidate_property(image.property_id)
+
+            if not PropertyImage.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+            for sizes in old_thumbnails.values():
+                for thumbnail in sizes.values():
+                    default_storage.delete(thumbnail)
+            adopted += 1
+        return adopted, missing
@@ -0,0 +1,188 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from apps.api.filters import filter_properties, get_ordering
+from apps.api.models import Property
+from apps.api.pagination import KeysetPagination
+from apps.api.seeding import CITIES
+
+BENCH_USERNAME = 'listing-bench'
+BENCH_REF_PREFIX = 'bench-'
+BENCH_OWNERS = 50
+
+# Synthetic rows spread over the last two years, ~85% active
+SEED_SQL = """
+INSERT INTO api_property (
+    title, description, price, surface_area, rooms, bedrooms, bathrooms, furnished,
+    property_type, status, city, address, postal_code, latitude, longitude,
+    published_at, user_id, is_active, external_ref, created_at, updated_at
+)
+SELECT
+    'Listing ' || n,
+    'Synthetic listing ' || n,
+    round((50000 + random() * 4950000)::numeric, 2),
+    20 + floor(random() * 480)::int,
+    1 + floor(random() * 8)::int,
+    floor(random() * 6)::int,
+    1 + floor(random() * 3)::int,
+    random() < 0.3,
+    (%(types)s::text[])[1 + floor(random() * %(type_count)s)::int],
+    (%(statuses)s::text[])[1 + floor(random() * %(status_count)s)::int],
+    (%(cities)s::text[])[1 + floor(random() * %(city_count)s)::int],
+    n || ' Avenue Mohammed V',
+    '',
+    round((27.7 + random() * 8.2)::numeric, 6),
+    round((-13.2 + random() * 14.2)::numeric, 6),
+    now() - random() * interval '730 days',
+    (%(owners)s::bigint[])[1 + floor(random() * %(owner_count)s)::int],
+    random() < 0.85,
+    %(prefix)s || n,
+    now(),
+    now()
+FROM generate_series(%(start)s, %(stop)s) AS n
+"""
+
+
+def listing_queries(owner_id):
+    """
+    (name, params) pairs mirroring what the listing endpoint actually runs:
+    the default page, a city/type/price search, an owner's page and a deep
+    keyset page.
+    """
+    return [
+        ('newest', {}),
+        ('city', {'city': 'Marrakech'}),
+        ('city_type_price', {
+            'city': 'Casablanca', 'property_type': 'apartment',
+            'min_price': '500000', 'max_price': '1500000', 'ordering': 'price_low',
+        }),
+        ('owner', {'user': str(owner_id)}),
+        ('deep_page', {'_seek': 'published_at'}),
+    ]
+
+
+def build_queryset(params, page_size):
+    params = dict(params)
+    seek = params.pop('_seek', None)
+    query = QueryDict(mutable=True)
+    query.update(params)
+
+    queryset = Property.objects.defer('search_vector')
+    queryset = filter_properties(queryset, query)
+    ordering = get_ordering(query)
+    if seek:
+        # Jump roughly halfway down the listing, as a cursor would after many pages
+        middle = queryset.count() // 2
+        position = list(queryset.order_by(*ordering).values_list('published_at', 'id')[middle:middle + 1])
+        if position:
+            published_at, pk = position[0]
+            queryset = queryset.filter(
+                KeysetPagination.seek_filter(ordering, [published_at.isoformat(), pk])
+            )
+    return queryset.order_by(*ordering)[:page_size + 1]
+
+
+def plan_indexes(node):
+    """Names of every index the plan touches"""
+    names = []
+    if 'Index Name' in node:
+        names.append(node['Index Name'])
+    for child in node.get('Plans', []):
+        names.extend(plan_indexes(child))
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE the listing query shapes, optionally seeding synthetic '
+        'rows first (e.g. --seed 1000000) so the planner sees realistic sizes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Insert this many synthetic properties first')
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic properties and exit')
+        parser.add_argument('--page-size', type=int, default=KeysetPagination.page_size)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN ANALYZE reports require PostgreSQL')
+
+        if options['cleanup']:
+            deleted, _ = Property.objects.filter(external_ref__startswith=BENCH_REF_PREFIX).delete()
+            get_user_model().objects.filter(username__startswith=BENCH_USERNAME).delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} synthetic rows'))
+            return
+
+        owners = self.get_owners()
+        if options['seed']:
+            self.seed(options['seed'], options['batch_size'], owners, options['verbosity'])
+
+        report = []
+        for name, params in listing_queries(owners[0]):
+            queryset = build_queryset(params, options['page_size'])
+            plan = json.loads(queryset.explain(format='json', analyze=True, buffers=True))[0]
+            report.append({
+                'query': name,
+                'params': params,
+                'execution_ms': plan['Execution Time'],
+                'planning_ms': plan['Planning Time'],
+                'indexes': plan_indexes(plan['Plan']),
+                'plan': plan['Plan'] if options['verbosity'] > 1 else None,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+            return
+        for row in report:
+            indexes = ', '.join(row['indexes']) or 'sequential scan'
+            self.stdout.write(
+                f"{row['query']:<18} {row['execution_ms']:>9.2f} ms  "
+                f"(plan {row['planning_ms']:.2f} ms)  {indexes}"
+            )
+            if row['plan'] is not None:
+                self.stdout.write(json.dumps(row['plan'], indent=2))
+
+    def get_owners(self):
+        User = get_user_model()
+        owners = []
+        for i in range(BENCH_OWNERS):
+            user, _ = User.objects.get_or_create(
+                username=f'{BENCH_USERNAME}-{i}', defaults={'email': f'{BENCH_USERNAME}-{i}@example.com'}
+            )
+            owners.append(user.pk)
+        return owners
+
+    def seed(self, count, batch_size, owners, verbosity):
+        start = Property.objects.filter(external_ref__startswith=BENCH_REF_PREFIX).count() + 1
+        params = {
+            'types': [value for value, _ in Property.PROPERTY_TYPE_CHOICES],
+            'statuses': [value for value, _ in Property.STATUS_CHOICES],
+            'cities': list(CITIES),
+            'owners': owners,
+            'prefix': BENCH_REF_PREFIX,
+        }
+        params.update(
+            type_count=len(params['types']), status_count=len(params['statuses']),
+            city_count=len(CITIES), owner_count=len(owners),
+        )
+
+        started = time.monotonic()
+        for offset in range(0, count, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(SEED_SQL, {
+                    **params,
+                    'start': start + offset,
+                    'stop': start + min(offset + batch_size, count) - 1,
+                })
+            if verbosity > 1:
+                self.stdout.write(f'{min(offset + batch_size, count)} rows seeded')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE api_property')
+        self.stdout.write(f'Seeded {count} properties in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from apps.api.models import PropertyImage
+from apps.api.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive thumbnails for property images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate thumbnails for every image',
+        )
+
+    def handle(self, *args, **options):
+        queryset = PropertyImage.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(thumbnails={})
+
+        done = 0
+        for image_id in queryset.values_list('pk', flat=True).iterator():
+            try:
+                generate_thumbnails(image_id)
+                done += 1
+            except (OSError, ValueError) as e:
+                self.stderr.write(f'Skipping image {image_id}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated thumbnails for {done} images'))
@@ -0,0 +1,91 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.api.caching import invalidate_properties
+from apps.api.feeds import FORMATS, batched, detect_format, read_rows
+from apps.api.models import Property
+from apps.api.serializer import PropertyFeedSerializer
+
+# Columns refreshed when a row with an existing (user, external_ref) is imported again
+# A listing the feed still carries is revived if it was soft-deleted
+UPDATE_FIELDS = [f for f in PropertyFeedSerializer.Meta.fields if f != 'external_ref'] + ['updated_at', 'deleted_at']
+
+
+class Command(BaseCommand):
+    help = 'Upsert properties for one owner from a CSV or JSONL feed, keyed on external_ref'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Feed file to import')
+        parser.add_argument('--user', required=True, help='Username or id of the owning account')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        try:
+            fmt = detect_format(options['path'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        imported = failed = 0
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            for batch in batched(read_rows(f, fmt), options['batch_size']):
+                properties, errors = self.validate_batch(batch, user)
+                for line_number, error in errors:
+                    self.stderr.write(f'Line {line_number}: {error}')
+                failed += len(errors)
+                imported += self.upsert(properties)
+
+                if options['verbosity'] > 1:
+                    rate = imported / max(time.monotonic() - started, 1e-9)
+                    self.stdout.write(f'{imported} rows imported ({rate:.0f} rows/s)')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} properties, {failed} rejected, in {elapsed:.1f}s '
+            f'({imported / max(elapsed, 1e-9):.0f} rows/s)'
+        ))
+
+    def get_user(self, value):
+        User = get_user_model()
+        lookup = {'pk': value} if value.isdigit() else {'username': value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f'User {value} does not exist')
+
+    def validate_batch(self, batch, user):
+        # Keyed on external_ref so a feed repeating a listing keeps the last row;
+        # ON CONFLICT cannot touch the same row twice in one statement
+        properties = {}
+        errors = []
+        for line_number, row in batch:
+            if isinstance(row, Exception):
+                errors.append((line_number, f'Invalid JSON: {row}'))
+                continue
+            serializer = PropertyFeedSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append((line_number, json.dumps(serializer.errors)))
+                continue
+            data = serializer.validated_data
+            properties[data['external_ref']] = Property(user=user, **data)
+        return list(properties.values()), errors
+
+    def upsert(self, properties):
+        if not properties:
+            return 0
+        with transaction.atomic():
+            Property.objects.bulk_create(
+                properties,
+                update_conflicts=True,
+                unique_fields=['user', 'external_ref'],
+                update_fields=UPDATE_FIELDS,
+            )
+            # bulk_create skips post_save, so invalidate cached responses here
+            invalidate_properties([p.pk for p in properties])
+        return len(properties)
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.api.models import Upload
+from apps.api.uploads import remove_temp_file
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads (and their temporary files) that have not been touched recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Age of the last chunk before an upload is dropped')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = list(Upload.objects.filter(updated_at__lt=cutoff).values_list('pk', flat=True))
+        Upload.objects.filter(pk__in=stale).delete()
+        for upload_id in stale:
+            remove_temp_file(upload_id)
+        self.stdout.write(self.style.SUCCESS(f'Purged {len(stale)} stale uploads'))
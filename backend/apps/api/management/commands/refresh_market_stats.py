@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.api.market import refresh_market_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the market statistics of the (city, type, status) groups '
+        'touched since the last run; meant to be run from cron every few minutes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every group')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated, removed = refresh_market_stats(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {updated} groups, removed {removed} in {time.perf_counter() - started:.2f}s'
+        ))
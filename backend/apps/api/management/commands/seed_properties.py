@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.api.caching import LIST_VERSION_KEY, bump_version
+from apps.api.models import Property
+from apps.api.seeding import (
+    SEED_REF_PREFIX, SEED_USERNAME, create_seed_properties, create_seed_users, seed_images,
+)
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate realistic users, properties and image rows for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, required=True, help='Number of properties to create')
+        parser.add_argument('--users', type=int, help='Number of owners (defaults to one per 20 properties)')
+        parser.add_argument('--images', type=int, default=4, help='Maximum image rows per property')
+        parser.add_argument('--password', default='benchmark', help='Password shared by the seeded users')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable datasets')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded rows first')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count < 0:
+            raise CommandError('--count must not be negative')
+
+        if options['clear']:
+            deleted, _ = Property.objects.filter(external_ref__startswith=SEED_REF_PREFIX).delete()
+            User.objects.filter(username__startswith=f'{SEED_USERNAME}-').delete()
+            self.stdout.write(f'Deleted {deleted} previously seeded rows')
+
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
+
+        # Continue numbering after any earlier run so usernames and refs stay unique
+        user_start = User.objects.filter(username__startswith=f'{SEED_USERNAME}-').count()
+        property_start = Property.objects.filter(external_ref__startswith=SEED_REF_PREFIX).count()
+
+        user_count = options['users'] if options['users'] is not None else -(-count // 20)
+        if count and not user_count:
+            raise CommandError('--users must be at least 1')
+        users = create_seed_users(user_count, options['password'], start=user_start)
+        user_ids = [user.pk for user in users]
+        images = seed_images() if options['images'] else []
+
+        created = image_rows = 0
+        batch_size = options['batch_size']
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            with transaction.atomic():
+                _, image_count = create_seed_properties(
+                    rng, size, user_ids, images, options['images'], start=property_start + offset
+                )
+            created += size
+            image_rows += image_count
+            if options['verbosity'] > 1:
+                rate = created / max(time.monotonic() - started, 1e-9)
+                self.stdout.write(f'{created} properties created ({rate:.0f} rows/s)')
+
+        # bulk_create skips post_save, so retire cached listings explicitly
+        bump_version(LIST_VERSION_KEY)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {user_count} users, {created} properties and {image_rows} images '
+            f'in {elapsed:.1f}s ({created / max(elapsed, 1e-9):.0f} properties/s)'
+        ))
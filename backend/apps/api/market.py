@@ -0,0 +1,136 @@
+"""
+Market statistics rollup: price percentiles per (city, type, status).
+
+Computing a median over every listing is a full scan, so the numbers are
+kept in MarketStat and refreshed by `manage.py refresh_market_stats`. A
+refresh only recomputes the groups that listings were written to since
+the previous run (found through `updated_at`). Groups that listings were
+deleted from, or moved out of or into, are also flagged `stale` by a
+database trigger (migration 0010). Sale and rent prices aren't
+comparable, so status is part of the group.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Aggregate, Count, F, FloatField, Max, Q
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import MarketStat, Property
+
+GROUP_FIELDS = ('city', 'property_type', 'status')
+STAT_FIELDS = ('listing_count', 'median_price', 'p25_price_per_m2', 'median_price_per_m2', 'p75_price_per_m2')
+
+# Writes committed this long after they were stamped (long transactions)
+# are still picked up by the next run
+REFRESH_OVERLAP = timedelta(minutes=10)
+
+# Groups per query when recomputing a set of groups
+GROUP_BATCH_SIZE = 500
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL's continuous percentile, e.g. PercentileCont('price', 0.5) for the median"""
+    function = 'percentile_cont'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        fraction = float(fraction)
+        if not 0 <= fraction <= 1:
+            raise ValueError('fraction must be between 0 and 1')
+        super().__init__(expression, fraction=fraction, **extra)
+
+
+def money(value):
+    return None if value is None else Decimal(str(round(value, 2)))
+
+
+def compute_stats(groups=None):
+    """
+    Aggregate the active listings of `groups` (all groups when None) in
+    SQL. Returns {(city, property_type, status): field values}.
+    """
+    price_per_m2 = Cast('price', FloatField()) / F('surface_area')
+    queryset = Property.objects.filter(is_active=True, surface_area__gt=0)
+    if groups is not None:
+        if not groups:
+            return {}
+        queryset = queryset.filter(group_filter(groups))
+
+    rows = (
+        queryset.order_by()
+        .values(*GROUP_FIELDS)
+        .annotate(
+            listing_count=Count('id'),
+            median_price=PercentileCont('price', 0.5),
+            p25_price_per_m2=PercentileCont(price_per_m2, 0.25),
+            median_price_per_m2=PercentileCont(price_per_m2, 0.5),
+            p75_price_per_m2=PercentileCont(price_per_m2, 0.75),
+        )
+    )
+    return {
+        tuple(row[field] for field in GROUP_FIELDS): {
+            'listing_count': row['listing_count'],
+            'median_price': money(row['median_price']),
+            'p25_price_per_m2': money(row['p25_price_per_m2']),
+            'median_price_per_m2': money(row['median_price_per_m2']),
+            'p75_price_per_m2': money(row['p75_price_per_m2']),
+        }
+        for row in rows
+    }
+
+
+def group_filter(groups):
+    return reduce(or_, (Q(**dict(zip(GROUP_FIELDS, group))) for group in groups), Q(pk__in=[]))
+
+
+def claim_stale_groups():
+    """
+    Clear the stale flags and return their groups. Flags the trigger sets
+    after this are kept for the next run, since the upsert leaves `stale` alone.
+    """
+    with transaction.atomic():
+        stale = list(MarketStat.objects.select_for_update().filter(stale=True).values_list('pk', *GROUP_FIELDS))
+        MarketStat.objects.filter(pk__in=[row[0] for row in stale]).update(stale=False)
+    return {row[1:] for row in stale}
+
+
+def refresh_market_stats(full=False):
+    """
+    Bring MarketStat up to date. Without `full`, only the groups touched
+    since the last refresh are recomputed; the first run is always full.
+    Returns (groups updated, groups removed).
+    """
+    started = timezone.now()
+    last_refresh = MarketStat.objects.aggregate(last=Max('refreshed_at'))['last']
+    stale = claim_stale_groups()
+    if full or last_refresh is None:
+        stats = compute_stats()
+        groups = set(MarketStat.objects.values_list(*GROUP_FIELDS)) | set(stats)
+    else:
+        since = last_refresh - REFRESH_OVERLAP
+        written = Property.objects.filter(updated_at__gt=since).order_by().values_list(*GROUP_FIELDS).distinct()
+        groups = list(set(written) | stale)
+        stats = {}
+        for i in range(0, len(groups), GROUP_BATCH_SIZE):
+            stats.update(compute_stats(groups[i:i + GROUP_BATCH_SIZE]))
+
+    rows = [
+        MarketStat(**dict(zip(GROUP_FIELDS, group)), **values, refreshed_at=started)
+        for group, values in stats.items()
+    ]
+    emptied = [group for group in groups if group not in stats]
+    deleted = 0
+    with transaction.atomic():
+        if rows:
+            MarketStat.objects.bulk_create(
+                rows, batch_size=GROUP_BATCH_SIZE, update_conflicts=True,
+                unique_fields=list(GROUP_FIELDS), update_fields=[*STAT_FIELDS, 'refreshed_at'],
+            )
+        for i in range(0, len(emptied), GROUP_BATCH_SIZE):
+            deleted += MarketStat.objects.filter(group_filter(emptied[i:i + GROUP_BATCH_SIZE])).delete()[0]
+    return len(rows), deleted
@@ -0,0 +1,132 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds, Prometheus style (an implicit +Inf bucket follows)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 10_000_000)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{format_labels(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+                lines.append(f'{self.name}_count{format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    """
+    In-process metrics. Every worker process keeps its own numbers, so a
+    scraper sees the process that happened to answer.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'http_requests_total', 'Requests handled, by route and status',
+))
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Wall time spent handling a request', DURATION_BUCKETS,
+))
+db_queries = registry.register(Histogram(
+    'http_request_db_queries', 'Database queries issued per request', QUERY_BUCKETS,
+))
+db_duration = registry.register(Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request', DURATION_BUCKETS,
+))
+serialize_duration = registry.register(Histogram(
+    'http_request_serialize_duration_seconds', 'Time spent serializing response data', DURATION_BUCKETS,
+))
+response_size = registry.register(Histogram(
+    'http_response_size_bytes', 'Response body size', SIZE_BUCKETS,
+))
+over_query_budget = registry.register(Counter(
+    'http_requests_over_query_budget_total', 'Requests that issued more queries than QUERY_BUDGET',
+))
+
+
+@contextmanager
+def timing(request, name):
+    """
+    Add the time spent in the block to `request.timings[name]` (in seconds).
+    A no-op when the performance middleware isn't installed.
+    """
+    timings = getattr(request, 'timings', None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
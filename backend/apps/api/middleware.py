@@ -0,0 +1,149 @@
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger('apps.api.performance')
+
+DEFAULT_QUERY_BUDGET = 20
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and adds up their duration"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+# The QueryTimer of the request being handled. Context variables follow the
+# request into sync_to_async threads, where the async ORM runs its queries.
+current_queries = contextvars.ContextVar('current_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper installed on every connection (see signals.py)"""
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class PerformanceMiddleware:
+    """
+    Measure every request: wall time, database queries and their time,
+    serializer and render time, and response size. The numbers go out as a
+    Server-Timing header, a log record and the histograms at /api/_metrics.
+    Requests issuing more than QUERY_BUDGET queries are logged as warnings.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.timings = {}
+        queries = QueryTimer()
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        # Staying async keeps ASGI requests off the sync thread. Connections
+        # are per thread, so queries are counted through `current_queries`
+        # on whichever thread runs them.
+        request.timings = {}
+        queries = QueryTimer()
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that too
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.timings['render'] = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, duration, queries):
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        serialize = request.timings.get('serialize')
+
+        response['Server-Timing'] = ', '.join(
+            [f'total;dur={duration * 1000:.1f}',
+             f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"']
+            + [f'{name};dur={value * 1000:.1f}' for name, value in request.timings.items()]
+        )
+
+        labels = {'method': request.method, 'route': route}
+        metrics.requests_total.inc(status=response.status_code, **labels)
+        metrics.request_duration.observe(duration, **labels)
+        metrics.db_queries.observe(queries.count, **labels)
+        metrics.db_duration.observe(queries.duration, **labels)
+        if serialize is not None:
+            metrics.serialize_duration.observe(serialize, **labels)
+        if size is not None:
+            metrics.response_size.observe(size, **labels)
+
+        fields = {
+            'method': request.method,
+            'route': route,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_queries': queries.count,
+            'db_ms': round(queries.duration * 1000, 2),
+            'response_bytes': size,
+            **{f'{name}_ms': round(value * 1000, 2) for name, value in request.timings.items()},
+        }
+        budget = getattr(settings, 'QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+        if budget is not None and queries.count > budget:
+            metrics.over_query_budget.inc(**labels)
+            logger.warning(
+                '%s %s issued %d queries (budget %d)',
+                request.method, request.path, queries.count, budget,
+                extra={'request_metrics': fields},
+            )
+        else:
+            logger.info(
+                '%s %s %s %.1fms', request.method, request.path, response.status_code, duration * 1000,
+                extra={'request_metrics': fields},
+            )
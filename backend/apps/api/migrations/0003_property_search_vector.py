@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+
+# The document is built with the 'simple' configuration over unaccented text so
+# French and Arabic listings match without language-specific stemming.
+SEARCH_VECTOR_SQL = """
+CREATE OR REPLACE FUNCTION api_property_search_vector(title text, description text, city text, address text)
+RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('simple', unaccent(coalesce(title, ''))), 'A')
+        || setweight(to_tsvector('simple', unaccent(coalesce(city, ''))), 'B')
+        || setweight(to_tsvector('simple', unaccent(coalesce(address, ''))), 'C')
+        || setweight(to_tsvector('simple', unaccent(coalesce(description, ''))), 'D')
+$$;
+
+CREATE OR REPLACE FUNCTION api_property_search_vector_trigger()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := api_property_search_vector(NEW.title, NEW.description, NEW.city, NEW.address);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER api_property_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description, city, address ON api_property
+    FOR EACH ROW EXECUTE FUNCTION api_property_search_vector_trigger();
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS api_property_search_vector_update ON api_property;
+DROP FUNCTION IF EXISTS api_property_search_vector_trigger();
+DROP FUNCTION IF EXISTS api_property_search_vector(text, text, text, text);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='property_search_vector_gin'),
+        ),
+        # Existing rows are filled in by `manage.py backfill_search_vectors`
+        migrations.RunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_property_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['latitude', 'longitude'], name='property_lat_lng_idx'),
+        ),
+    ]
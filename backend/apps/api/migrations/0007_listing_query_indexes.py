@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on a large table
+    atomic = False
+
+    dependencies = [
+        ('api', '0006_property_external_ref'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['city', 'property_type', 'price'], name='property_active_city_type_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-published_at', '-id'], name='property_active_published_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(fields=['user', 'published_at'], name='property_user_published_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+import apps.api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0008_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='Storage name of the file', max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(help_text='Size in bytes')),
+                ('ref_count', models.IntegerField(default=0, help_text='PropertyImage rows using this file')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='propertyimage',
+            name='image',
+            field=models.ImageField(help_text='Upload property photos', storage=apps.api.storage.image_storage, upload_to='property_images/'),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(condition=models.Q(('ref_count__lte', 0)), fields=['updated_at'], name='imageblob_unreferenced_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Listings that leave a (city, type, status) group, by being deleted or
+# moved, flag its statistics stale, as does the group a listing moves into;
+# other writes are found by `updated_at`. Bulk updates and raw SQL that
+# don't touch `updated_at` are covered this way too.
+MARK_STALE_SQL = """
+CREATE OR REPLACE FUNCTION api_marketstat_mark_stale()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE'
+            OR (OLD.city, OLD.property_type, OLD.status) IS DISTINCT FROM (NEW.city, NEW.property_type, NEW.status) THEN
+        UPDATE api_marketstat SET stale = true
+        WHERE city = OLD.city AND property_type = OLD.property_type AND status = OLD.status AND NOT stale;
+    END IF;
+    IF TG_OP = 'UPDATE'
+            AND (OLD.city, OLD.property_type, OLD.status) IS DISTINCT FROM (NEW.city, NEW.property_type, NEW.status) THEN
+        UPDATE api_marketstat SET stale = true
+        WHERE city = NEW.city AND property_type = NEW.property_type AND status = NEW.status AND NOT stale;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER api_property_marketstat_stale
+    AFTER UPDATE OF city, property_type, status OR DELETE ON api_property
+    FOR EACH ROW EXECUTE FUNCTION api_marketstat_mark_stale();
+"""
+
+DROP_MARK_STALE_SQL = """
+DROP TRIGGER IF EXISTS api_property_marketstat_stale ON api_property;
+DROP FUNCTION IF EXISTS api_marketstat_mark_stale();
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0009_imageblob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('property_type', models.CharField(choices=[('apartment', 'Apartment'), ('studio', 'Studio'), ('duplex', 'Duplex'), ('triplex', 'Triplex'), ('penthouse', 'Penthouse'), ('house', 'House'), ('villa', 'Villa'), ('riad', 'Riad'), ('urban_land', 'Urban Land'), ('agricultural_land', 'Agricultural Land'), ('farm_ranch', 'Farm / Ranch'), ('office', 'Office'), ('shop', 'Shop / Commercial Space'), ('warehouse', 'Warehouse / Storage'), ('factory', 'Factory'), ('restaurant', 'Restaurant / Café'), ('hotel', 'Hotel / Guesthouse'), ('building', 'Building'), ('showroom', 'Showroom'), ('parking', 'Parking / Garage')], max_length=50)),
+                ('status', models.CharField(choices=[('for_sale', 'For Sale'), ('for_rent', 'For Rent'), ('sold', 'Sold'), ('rented', 'Rented')], max_length=20)),
+                ('listing_count', models.PositiveIntegerField()),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p25_price_per_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('median_price_per_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p75_price_per_m2', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('stale', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['city', 'property_type', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='marketstat',
+            constraint=models.UniqueConstraint(fields=('city', 'property_type', 'status'), name='marketstat_group_uniq'),
+        ),
+        migrations.RunSQL(MARK_STALE_SQL, DROP_MARK_STALE_SQL),
+    ]
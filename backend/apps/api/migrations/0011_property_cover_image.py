@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The cover is the first image in PropertyImage.Meta.ordering (cover flag
+# first, then oldest), with the id as a tie-breaker. Statement-level
+# triggers refresh each affected property once, however many image rows a
+# bulk insert, update or delete touched.
+IMAGE_SUMMARY_SQL = """
+CREATE OR REPLACE FUNCTION api_property_refresh_images(property_ids bigint[])
+RETURNS void LANGUAGE sql AS $$
+    UPDATE api_property p SET
+        cover_image_id = (
+            SELECT i.id FROM api_propertyimage i WHERE i.property_id = p.id
+            ORDER BY i.is_cover DESC, i.created_at, i.id LIMIT 1
+        ),
+        image_count = (SELECT count(*) FROM api_propertyimage i WHERE i.property_id = p.id)
+    WHERE p.id = ANY(property_ids);
+$$;
+
+CREATE OR REPLACE FUNCTION api_propertyimage_changed()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM api_property_refresh_images(ARRAY(SELECT DISTINCT property_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM api_property_refresh_images(ARRAY(SELECT DISTINCT property_id FROM old_rows));
+    ELSE
+        PERFORM api_property_refresh_images(ARRAY(
+            SELECT property_id FROM new_rows UNION SELECT property_id FROM old_rows
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER api_propertyimage_inserted
+    AFTER INSERT ON api_propertyimage REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION api_propertyimage_changed();
+CREATE TRIGGER api_propertyimage_updated
+    AFTER UPDATE ON api_propertyimage REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION api_propertyimage_changed();
+CREATE TRIGGER api_propertyimage_deleted
+    AFTER DELETE ON api_propertyimage REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION api_propertyimage_changed();
+"""
+
+DROP_IMAGE_SUMMARY_SQL = """
+DROP TRIGGER IF EXISTS api_propertyimage_inserted ON api_propertyimage;
+DROP TRIGGER IF EXISTS api_propertyimage_updated ON api_propertyimage;
+DROP TRIGGER IF EXISTS api_propertyimage_deleted ON api_propertyimage;
+DROP FUNCTION IF EXISTS api_propertyimage_changed();
+DROP FUNCTION IF EXISTS api_property_refresh_images(bigint[]);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_marketstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='cover_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.propertyimage'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        # Existing rows are filled in by 0013_backfill_property_images
+        migrations.RunSQL(IMAGE_SUMMARY_SQL, DROP_IMAGE_SUMMARY_SQL),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+import apps.api.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_property_cover_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProperty',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('surface_area', models.PositiveIntegerField()),
+                ('rooms', models.PositiveIntegerField()),
+                ('bedrooms', models.PositiveIntegerField()),
+                ('bathrooms', models.PositiveIntegerField()),
+                ('furnished', models.BooleanField(default=False)),
+                ('property_type', models.CharField(choices=[('apartment', 'Apartment'), ('studio', 'Studio'), ('duplex', 'Duplex'), ('triplex', 'Triplex'), ('penthouse', 'Penthouse'), ('house', 'House'), ('villa', 'Villa'), ('riad', 'Riad'), ('urban_land', 'Urban Land'), ('agricultural_land', 'Agricultural Land'), ('farm_ranch', 'Farm / Ranch'), ('office', 'Office'), ('shop', 'Shop / Commercial Space'), ('warehouse', 'Warehouse / Storage'), ('factory', 'Factory'), ('restaurant', 'Restaurant / Café'), ('hotel', 'Hotel / Guesthouse'), ('building', 'Building'), ('showroom', 'Showroom'), ('parking', 'Parking / Garage')], max_length=50)),
+                ('status', models.CharField(choices=[('for_sale', 'For Sale'), ('for_rent', 'For Rent'), ('sold', 'Sold'), ('rented', 'Rented')], max_length=20)),
+                ('city', models.CharField(max_length=100)),
+                ('address', models.CharField(max_length=255)),
+                ('postal_code', models.CharField(blank=True, max_length=10)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('published_at', models.DateTimeField()),
+                ('is_active', models.BooleanField()),
+                ('external_ref', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived properties',
+                'ordering': ['-published_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPropertyImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(storage=apps.api.storage.image_storage, upload_to='property_images/')),
+                ('is_cover', models.BooleanField(default=False)),
+                ('thumbnails', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-is_cover', 'created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedproperty',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_properties', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedpropertyimage',
+            name='property',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='api.archivedproperty'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedproperty',
+            index=models.Index(fields=['user', 'published_at'], name='archivedproperty_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpropertyimage',
+            index=models.Index(fields=['image'], name='archivedimage_image_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def backfill_image_summary(apps, schema_editor):
+    """
+    Fill cover_image and image_count for properties that had images before
+    the triggers of 0011 existed, a batch per transaction so the listings
+    table is never locked for long. Properties without images already hold
+    the right defaults.
+    """
+    PropertyImage = apps.get_model('api', 'PropertyImage')
+    connection = schema_editor.connection
+    property_ids = list(
+        PropertyImage.objects.using(connection.alias)
+        .order_by('property_id').values_list('property_id', flat=True).distinct()
+    )
+    for i in range(0, len(property_ids), BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT api_property_refresh_images(%s::bigint[])', [property_ids[i:i + BATCH_SIZE]]
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('api', '0012_property_soft_delete_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_image_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built without locking writes, which can't happen in a transaction; kept
+    # apart from 0010 so that one still applies atomically
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_backfill_property_images'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(fields=['updated_at'], name='property_updated_at_idx'),
+        ),
+    ]
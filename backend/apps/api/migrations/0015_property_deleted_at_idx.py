@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY refuses to run in a transaction, so the
+    # index has a migration to itself and 0012 stays atomic
+    atomic = False
+
+    dependencies = [
+        ('api', '0014_property_updated_at_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='property_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:45
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Concurrent, so image uploads aren't blocked while it builds; that rules
+    # out a transaction, which is why it isn't part of 0009
+    atomic = False
+
+    dependencies = [
+        ('api', '0015_property_deleted_at_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='propertyimage',
+            index=models.Index(fields=['image'], name='propertyimage_image_idx'),
+        ),
+    ]
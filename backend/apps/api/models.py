@@ -1,10 +1,34 @@
+import uuid
+
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 
+from .storage import image_storage
+
 User = get_user_model()
 
+
+class PropertyQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """
+        Hide listings without deleting them; `archive_properties` purges them
+        later. .update() skips post_save, so callers invalidate the cache.
+        """
+        now = timezone.now()
+        return self.update(deleted_at=now, is_active=False, updated_at=now)
+
+
+class PropertyManager(models.Manager.from_queryset(PropertyQuerySet)):
+    """Listings that haven't been deleted; `Property.all_objects` includes them"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Property(models.Model):
     PROPERTY_TYPE_CHOICES = [
         ('apartment', 'Apartment'),                     # Self-contained unit in a multi-story building
@@ -36,6 +60,10 @@ class Property(models.Model):
         ('rented', 'Rented'),
     ]
     
+    # Maintained from the images by triggers (see `cover_image`)
+    IMAGE_SUMMARY_FIELDS = ('cover_image', 'image_count')
+    TRIGGER_FIELDS = IMAGE_SUMMARY_FIELDS + ('search_vector',)
+    
     # Basic Information
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -86,6 +114,27 @@ class Property(models.Model):
         related_name='properties'
     )
     is_active = models.BooleanField(default=True)
+    # Identifier of the listing in an agency's own feed, used to upsert imports
+    external_ref = models.CharField(max_length=100, null=True, blank=True)
+    
+    # Full-text search document, maintained by a database trigger (see migration 0003)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Copies of what the images say, maintained by database triggers (see
+    # migration 0011) so listings don't have to read the images table
+    cover_image = models.ForeignKey(
+        'PropertyImage',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    image_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set by DELETE; the row is purged by `manage.py archive_properties`
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = PropertyManager()
+    all_objects = PropertyQuerySet.as_manager()
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -99,10 +148,54 @@ class Property(models.Model):
             models.Index(fields=['property_type']),
             models.Index(fields=['city']),
             models.Index(fields=['status']),
+            models.Index(fields=['latitude', 'longitude'], name='property_lat_lng_idx'),
+            # Shapes of the public listing queries, which only ever see active rows
+            models.Index(
+                fields=['city', 'property_type', 'price'],
+                condition=models.Q(is_active=True),
+                name='property_active_city_type_idx',
+            ),
+            models.Index(
+                fields=['-published_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='property_active_published_idx',
+            ),
+            models.Index(fields=['user', 'published_at'], name='property_user_published_idx'),
+            # Incremental refreshes (market statistics) look for recent writes
+            models.Index(fields=['updated_at'], name='property_updated_at_idx'),
+            # Only the soft-deleted rows waiting to be purged
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='property_deleted_at_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='property_search_vector_gin'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'external_ref'], name='property_user_external_ref_uniq'),
         ]
     
     def __str__(self):
         return f"{self.title} ({self.get_property_type_display()}) - {self.city}"
+    
+    def soft_delete(self):
+        self.deleted_at = self.updated_at = timezone.now()
+        self.is_active = False
+        Property.all_objects.filter(pk=self.pk).update(
+            deleted_at=self.deleted_at, is_active=False, updated_at=self.updated_at
+        )
+    
+    def save(self, *args, **kwargs):
+        # Trigger-maintained fields may be stale in memory, so an update never
+        # writes them back; nor deferred ones, which would cost a query each
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.attname not in deferred
+                and f.name not in self.TRIGGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
 class PropertyImage(models.Model):
     property = models.ForeignKey(
@@ -112,16 +205,166 @@ class PropertyImage(models.Model):
     )
     image = models.ImageField(
         upload_to='property_images/',
+        storage=image_storage,
         help_text="Upload property photos"
     )
     is_cover = models.BooleanField(
         default=False,
         help_text="Set as cover image"
     )
+    # Resized copies written by the thumbnail worker: {format: {width: file name}}
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-is_cover', 'created_at']
+        indexes = [
+            # Blob reference checks look rows up by file name
+            models.Index(fields=['image'], name='propertyimage_image_idx'),
+        ]
     
     def __str__(self):
-        return f"Image for {self.property.title}"
\ No newline at end of file
+        return f"Image for {self.property.title}"
+
+
+class ArchivedProperty(models.Model):
+    """
+    A listing moved out of Property by `manage.py archive_properties` after
+    being sold, rented or inactive for a while. It keeps its id, so
+    /api/properties/<id>/ still finds it, while the hot table and its
+    indexes only hold listings that can still show up in searches.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    surface_area = models.PositiveIntegerField()
+    rooms = models.PositiveIntegerField()
+    bedrooms = models.PositiveIntegerField()
+    bathrooms = models.PositiveIntegerField()
+    furnished = models.BooleanField(default=False)
+    property_type = models.CharField(max_length=50, choices=Property.PROPERTY_TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=Property.STATUS_CHOICES)
+    city = models.CharField(max_length=100)
+    address = models.CharField(max_length=255)
+    postal_code = models.CharField(max_length=10, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    published_at = models.DateTimeField()
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_properties'
+    )
+    is_active = models.BooleanField()
+    external_ref = models.CharField(max_length=100, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Archived properties"
+        ordering = ['-published_at']
+        indexes = [
+            models.Index(fields=['user', 'published_at'], name='archivedproperty_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_property_type_display()}) - {self.city} [archived]"
+
+
+class ArchivedPropertyImage(models.Model):
+    """An image of an archived listing; its file stays referenced (see storage.py)"""
+    property = models.ForeignKey(
+        ArchivedProperty,
+        on_delete=models.CASCADE,
+        related_name='images'
+    )
+    image = models.ImageField(upload_to='property_images/', storage=image_storage)
+    is_cover = models.BooleanField(default=False)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-is_cover', 'created_at']
+        indexes = [
+            models.Index(fields=['image'], name='archivedimage_image_idx'),
+        ]
+
+    def __str__(self):
+        return f"Image for {self.property.title} [archived]"
+
+
+class MarketStat(models.Model):
+    """
+    Price statistics of the active listings in one (city, type, status)
+    group, refreshed by `manage.py refresh_market_stats` (apps/api/market.py)
+    """
+    city = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=50, choices=Property.PROPERTY_TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=Property.STATUS_CHOICES)
+    listing_count = models.PositiveIntegerField()
+    median_price = models.DecimalField(max_digits=12, decimal_places=2)
+    p25_price_per_m2 = models.DecimalField(max_digits=12, decimal_places=2)
+    median_price_per_m2 = models.DecimalField(max_digits=12, decimal_places=2)
+    p75_price_per_m2 = models.DecimalField(max_digits=12, decimal_places=2)
+    # Set by a trigger when a listing leaves the group (deleted or moved)
+    stale = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['city', 'property_type', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'property_type', 'status'], name='marketstat_group_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} / {self.property_type} / {self.status}"
+
+
+class ImageBlob(models.Model):
+    """
+    One stored image file, named after the BLAKE2 hash of its content and
+    shared by every PropertyImage with the same bytes (see apps/api/storage.py).
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the file")
+    size = models.PositiveBigIntegerField(help_text="Size in bytes")
+    ref_count = models.IntegerField(default=0, help_text="PropertyImage rows using this file")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], condition=models.Q(ref_count__lte=0), name='imageblob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class Upload(models.Model):
+    """
+    An image upload in progress. Chunks are appended to a temporary file
+    (see apps/api/uploads.py); once `offset` reaches `size` the upload can be
+    attached to a property, which turns it into a PropertyImage.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def complete(self):
+        return self.offset == self.size
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
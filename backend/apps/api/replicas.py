@@ -0,0 +1,195 @@
+"""
+Read replicas.
+
+ReplicaRouter sends reads to the aliases in DATABASE_REPLICAS and writes
+to `default`. Reads stay on the primary when:
+
+- the current request or job is pinned (`use_primary`), which
+  ReplicaMiddleware does for writes and, for REPLICA_STICKY_SECONDS after
+  one, for the caller's following requests (by cookie, and by user for
+  token-authenticated clients), so people see their own writes;
+- the primary has a transaction open, whose reads must see its writes;
+- every replica is further behind than REPLICA_MAX_LAG_SECONDS.
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+from apps.users.tokens import TokenError, verify_access_token
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_pinned = contextvars.ContextVar('replicas_pinned', default=False)
+_used = contextvars.ContextVar('replicas_used', default=False)
+
+# alias -> (monotonic time of the check, lag in seconds or None if unreachable)
+lag_checks = {}
+
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+
+
+def lag_check_interval():
+    return getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5)
+
+
+@contextmanager
+def use_primary():
+    """Send every read in this context to the primary; also a decorator"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def read_from_replica():
+    """Whether a read in the current context has gone to a replica"""
+    return _used.get()
+
+
+def measure_lag(alias):
+    """Replication delay of `alias` in seconds, or None if it can't be queried"""
+    try:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except (ConnectionDoesNotExist, DatabaseError):
+        logger.warning('Replica %s is unreachable', alias, exc_info=True)
+        return None
+
+
+def replica_lag(alias):
+    """Lag of `alias`, measured at most once per REPLICA_LAG_CHECK_SECONDS"""
+    now = time.monotonic()
+    checked = lag_checks.get(alias)
+    if checked is None or now - checked[0] >= lag_check_interval():
+        checked = lag_checks[alias] = (now, measure_lag(alias))
+    return checked[1]
+
+
+def healthy_replicas():
+    limit = max_lag()
+    return [alias for alias in replica_aliases() if (lag := replica_lag(alias)) is not None and lag <= limit]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        _used.set(True)
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def token_user_id(request):
+    """User id of a valid bearer token, without touching the database"""
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(header) != 2 or header[0].lower() != 'bearer':
+        return None
+    try:
+        return verify_access_token(header[1]).get('uid')
+    except TokenError:
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Pin writes, and the same caller's requests for REPLICA_STICKY_SECONDS
+    after a write, to the primary database
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+        with self.routing(request) as write:
+            response = self.get_response(request)
+        return self.finish(request, response, write)
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+        with self.routing(request) as write:
+            response = await self.get_response(request)
+        return self.finish(request, response, write)
+
+    @contextmanager
+    def routing(self, request):
+        write = request.method not in SAFE_METHODS
+        pinned = write or PIN_COOKIE in request.COOKIES
+        if not pinned:
+            user_id = token_user_id(request)
+            pinned = user_id is not None and cache.get(pin_key(user_id)) is not None
+        pinned_token, used_token = _pinned.set(pinned), _used.set(False)
+        try:
+            yield write
+        finally:
+            _pinned.reset(pinned_token)
+            _used.reset(used_token)
+
+    def finish(self, request, response, write):
+        if write:
+            seconds = sticky_seconds()
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+            user_id = token_user_id(request)
+            if user_id is not None:
+                cache.set(pin_key(user_id), 1, seconds)
+        return response
@@ -0,0 +1,148 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+from apps.users.models import User
+from .models import Property, PropertyImage
+
+SEED_USERNAME = 'seed-user'
+SEED_REF_PREFIX = 'seed-'
+SEED_IMAGE_DIR = 'property_images/seed'
+
+# City -> (latitude, longitude) of its centre
+CITIES = {
+    'Casablanca': (33.5731, -7.5898),
+    'Rabat': (34.0209, -6.8416),
+    'Marrakech': (31.6295, -7.9811),
+    'Fès': (34.0181, -5.0078),
+    'Tanger': (35.7595, -5.8340),
+    'Agadir': (30.4278, -9.5981),
+    'Meknès': (33.8935, -5.5473),
+    'Oujda': (34.6814, -1.9086),
+    'Kénitra': (34.2610, -6.5802),
+    'Tétouan': (35.5785, -5.3684),
+    'Salé': (34.0531, -6.7985),
+    'Essaouira': (31.5085, -9.7595),
+    'El Jadida': (33.2316, -8.5007),
+    'Nador': (35.1681, -2.9335),
+}
+
+# property_type -> (min surface m², max surface m², price per m² in MAD)
+PROPERTY_PROFILES = {
+    'apartment': (45, 160, 11000),
+    'studio': (20, 45, 12000),
+    'duplex': (100, 250, 12500),
+    'triplex': (160, 350, 12500),
+    'penthouse': (120, 400, 18000),
+    'house': (90, 300, 9000),
+    'villa': (200, 1200, 14000),
+    'riad': (120, 600, 10000),
+    'urban_land': (150, 3000, 3500),
+    'agricultural_land': (5000, 100000, 60),
+    'farm_ranch': (10000, 200000, 90),
+    'office': (40, 500, 13000),
+    'shop': (20, 300, 16000),
+    'warehouse': (300, 5000, 4000),
+    'factory': (800, 10000, 3500),
+    'restaurant': (60, 400, 14000),
+    'hotel': (400, 3000, 12000),
+    'building': (300, 2500, 9500),
+    'showroom': (100, 800, 15000),
+    'parking': (12, 30, 9000),
+}
+
+WITHOUT_ROOMS = {'urban_land', 'agricultural_land', 'farm_ranch', 'parking'}
+WITHOUT_BEDROOMS = WITHOUT_ROOMS | {'office', 'shop', 'warehouse', 'factory', 'restaurant', 'showroom'}
+
+STREETS = ['Avenue Mohammed V', 'Boulevard Hassan II', 'Rue Ibn Battouta', 'Derb Moulay Idriss', 'Avenue des FAR']
+ADJECTIVES = ['Bright', 'Spacious', 'Renovated', 'Quiet', 'Modern', 'Traditional', 'Sea-view', 'Central']
+
+IMAGE_COLOURS = ['#c96f3b', '#d9b38c', '#6b8f71', '#3b6ea5', '#8c5e58', '#e0c97f', '#7a7a7a', '#a3c4bc']
+
+
+def seed_images(width=1200, height=800):
+    """A small pool of placeholder photos that seeded image rows point at"""
+    names = []
+    for i, colour in enumerate(IMAGE_COLOURS):
+        name = f'{SEED_IMAGE_DIR}/placeholder_{i}.jpg'
+        if not default_storage.exists(name):
+            buffer = BytesIO()
+            Image.new('RGB', (width, height), colour).save(buffer, 'JPEG', quality=80)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def create_seed_users(count, password, start=0):
+    """Bulk insert `count` users sharing one password hash"""
+    hashed = make_password(password)
+    users = [
+        User(
+            username=f'{SEED_USERNAME}-{n}',
+            email=f'{SEED_USERNAME}-{n}@example.com',
+            password=hashed,
+            phone=f'+2126{n % 10 ** 8:08d}',
+        )
+        for n in range(start, start + count)
+    ]
+    return User.objects.bulk_create(users)
+
+
+def build_property(rng, n, user_id, now):
+    property_type = rng.choice(list(PROPERTY_PROFILES))
+    min_surface, max_surface, price_per_m2 = PROPERTY_PROFILES[property_type]
+    surface = rng.randint(min_surface, max_surface)
+    rooms = 0 if property_type in WITHOUT_ROOMS else max(1, min(surface // 35, 60) + rng.randint(-1, 1))
+    bedrooms = 0 if property_type in WITHOUT_BEDROOMS else max(0, rooms - rng.randint(1, 2))
+    status = rng.choices(['for_sale', 'for_rent', 'sold', 'rented'], weights=[55, 30, 10, 5])[0]
+    price = surface * price_per_m2 * rng.uniform(0.7, 1.4)
+    if status in ('for_rent', 'rented'):
+        price = price / 200
+
+    city = rng.choice(list(CITIES))
+    lat, lng = CITIES[city]
+    published_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 730))
+    return Property(
+        title=f'{rng.choice(ADJECTIVES)} {property_type.replace("_", " ")} in {city}',
+        description=f'Seeded listing {n}: {surface} m² {property_type.replace("_", " ")} in {city}.',
+        price=Decimal(min(price, 99999999)).quantize(Decimal('0.01')),
+        surface_area=surface,
+        rooms=rooms,
+        bedrooms=bedrooms,
+        bathrooms=0 if property_type in WITHOUT_ROOMS else max(1, bedrooms // 2),
+        furnished=bedrooms > 0 and rng.random() < 0.3,
+        property_type=property_type,
+        status=status,
+        city=city,
+        address=f'{rng.randint(1, 250)} {rng.choice(STREETS)}',
+        postal_code=f'{rng.randint(10000, 99999)}',
+        latitude=Decimal(lat + rng.uniform(-0.08, 0.08)).quantize(Decimal('0.000001')),
+        longitude=Decimal(lng + rng.uniform(-0.08, 0.08)).quantize(Decimal('0.000001')),
+        published_at=published_at,
+        user_id=user_id,
+        is_active=status in ('for_sale', 'for_rent') and rng.random() < 0.95,
+        external_ref=f'{SEED_REF_PREFIX}{n}',
+    )
+
+
+def create_seed_properties(rng, count, user_ids, images, images_per_property, start=0):
+    """
+    Bulk insert `count` properties (and their image rows) spread over
+    `user_ids`. Image rows bypass signals, so no thumbnails are queued.
+    """
+    now = timezone.now()
+    properties = Property.objects.bulk_create([
+        build_property(rng, n, rng.choice(user_ids), now) for n in range(start, start + count)
+    ])
+    property_images = []
+    for prop in properties:
+        for i in range(rng.randint(0, images_per_property) if images else 0):
+            property_images.append(PropertyImage(property=prop, image=rng.choice(images), is_cover=i == 0))
+    PropertyImage.objects.bulk_create(property_images)
+    return properties, len(property_images)
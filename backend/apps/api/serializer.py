@@ -1,8 +1,12 @@
+import logging
+
 from rest_framework import serializers
-from .models import Property, PropertyImage
+from .models import ArchivedProperty, ArchivedPropertyImage, MarketStat, Property, PropertyImage, Upload
 from django.contrib.auth import get_user_model
+from .thumbnails import THUMBNAIL_WIDTHS, build_srcset, pick_thumbnail, thumbnail_storage, thumbnail_url
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class UserSerializer(serializers.ModelSerializer):
     name = serializers.SerializerMethodField()
@@ -19,10 +23,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 class PropertyImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = PropertyImage
-        fields = '__all__'
+        exclude = ('thumbnails',)
     
     def get_image(self, obj):
         request = self.context.get('request')
@@ -31,9 +36,74 @@ class PropertyImageSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.image.url)
             return obj.image.url
         return None
+    
+    def get_srcset(self, obj):
+        # Empty until the thumbnail worker has processed the upload
+        return build_srcset(obj.image, obj.thumbnails, self.context.get('request'))
+
+class UploadSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = Upload
+        fields = ['id', 'filename', 'size', 'offset', 'complete', 'created_at']
+
+class MarketStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MarketStat
+        fields = [
+            'city', 'property_type', 'status', 'listing_count', 'median_price',
+            'p25_price_per_m2', 'median_price_per_m2', 'p75_price_per_m2', 'refreshed_at',
+        ]
+
+def cover_image_url(image, request=None):
+    """URL of a cover, preferring the card-sized thumbnail over the original upload"""
+    if image is None:
+        return None
+    name = pick_thumbnail(image.thumbnails, THUMBNAIL_WIDTHS['card'])
+    if name:
+        return thumbnail_url(thumbnail_storage(image.image), name, request)
+    if not image.image:
+        return None
+    return thumbnail_url(image.image.storage, image.image.name, request)
+
+class PropertyCardSerializer(serializers.ModelSerializer):
+    """Compact read-only representation used by the listing grid (`?view=card`)"""
+    cover_image = serializers.SerializerMethodField()
+    # Only present on results of a `near` query
+    distance_km = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = Property
+        fields = [
+            'id', 'title', 'price', 'city', 'address', 'property_type', 'status',
+            'surface_area', 'rooms', 'bedrooms', 'bathrooms', 'furnished',
+            'published_at', 'created_at', 'updated_at', 'cover_image', 'image_count', 'distance_km',
+        ]
+        read_only_fields = fields
+    
+    def get_cover_image(self, obj):
+        return cover_image_url(obj.cover_image, self.context.get('request'))
+
+def assign_owner(validated_data, request):
+    """
+    The owner of a new listing is the authenticated caller. Staff may create
+    listings for someone else by sending `user_id`; anyone else's is ignored.
+    """
+    data = dict(validated_data)
+    user = data.pop('user', None)
+    if request is not None and request.user.is_authenticated:
+        if request.user.is_staff and user is not None:
+            data['user_id'] = user.pk
+        else:
+            data['user_id'] = request.user.pk
+    elif user is not None:
+        data['user_id'] = user.pk
+    return data
 
 class PropertySerializer(serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
+    cover_image = serializers.SerializerMethodField()
     uploaded_images = serializers.ListField(
         child=serializers.ImageField(
             max_length=5242880,  # 5MB max
@@ -49,11 +119,13 @@ class PropertySerializer(serializers.ModelSerializer):
         required=False
     )
     user = UserSerializer(read_only=True)
+    # Only present on results of a `near` query
+    distance_km = serializers.FloatField(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), write_only=True, required=False, source='user')
     
     class Meta:
         model = Property
-        fields = '__all__'
+        exclude = ('search_vector', 'deleted_at')
         read_only_fields = ('created_at', 'updated_at', 'published_at')
         # Make all fields optional for easier form handling
         extra_kwargs = {
@@ -75,48 +147,71 @@ class PropertySerializer(serializers.ModelSerializer):
             'furnished': {'required': False},
             'user': {'required': False}
         }
+        # The owner comes from the access token rather than the payload, so
+        # the generated (user, external_ref) validator is replaced by `validate`
+        validators = []
+    
+    def get_cover_image(self, obj):
+        return cover_image_url(obj.cover_image, self.context.get('request'))
+    
+    def owner_id(self, attrs):
+        """Id of the user the listing will belong to once saved"""
+        request = self.context.get('request')
+        if self.instance is None:
+            return assign_owner(attrs, request).get('user_id')
+        if attrs.get('user') is not None and request is not None and request.user.is_staff:
+            return attrs['user'].pk
+        return self.instance.user_id
+    
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        external_ref = attrs.get('external_ref', getattr(self.instance, 'external_ref', None))
+        if external_ref and ('external_ref' in attrs or 'user' in attrs):
+            # Soft-deleted listings still hold their external_ref
+            duplicates = Property.all_objects.filter(user_id=self.owner_id(attrs), external_ref=external_ref)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError(
+                    {'external_ref': 'You already have a property with this external_ref.'}
+                )
+        return attrs
     
     def create(self, validated_data):
         uploaded_images = validated_data.pop('uploaded_images', [])
         
-        # Get the user from the form data if provided
-        user_id = self.context.get('request').data.get('user_id') if self.context.get('request') else None
+        validated_data = assign_owner(validated_data, self.context.get('request'))
         
-        if user_id:
-            try:
-                # Use the user ID from the form data
-                validated_data['user'] = User.objects.get(id=user_id)
-                print(f"Using user ID from form data: {user_id}")
-            except User.DoesNotExist:
-                print(f"User with ID {user_id} not found")
-        
-        # If user is still not set, try to get from request.user
-        if 'user' not in validated_data:
-            request = self.context.get('request')
-            if request and hasattr(request, 'user') and request.user.is_authenticated:
-                validated_data['user'] = request.user
-                print(f"Using authenticated user: {request.user.username} (ID: {request.user.id})")
-        
-        # Print validated data for debugging
-        print("Creating property with data:", validated_data)
-        print("User for this property:", validated_data.get('user', 'No user provided'))
+        logger.debug(
+            'Creating property for user %s: %s', validated_data.get('user_id'), validated_data,
+            extra={'images': uploaded_images},
+        )
         
         try:
             property = Property.objects.create(**validated_data)
             
             for image in uploaded_images:
                 PropertyImage.objects.create(property=property, image=image)
+            if uploaded_images:
+                property.refresh_from_db(fields=Property.IMAGE_SUMMARY_FIELDS)
                 
             return property
-        except Exception as e:
-            print(f"Error creating property: {e}")
+        except Exception:
+            logger.exception('Error creating property')
             raise
     
     def update(self, instance, validated_data):
         uploaded_images = validated_data.pop('uploaded_images', [])
         
-        # Print validated data for debugging
-        print("Updating property with data:", validated_data)
+        # Only staff may hand a listing over to another user
+        request = self.context.get('request')
+        if request is None or not request.user.is_staff:
+            validated_data.pop('user', None)
+        
+        logger.debug(
+            'Updating property %s: %s', instance.pk, validated_data,
+            extra={'images': uploaded_images},
+        )
         
         try:
             # Update property fields
@@ -127,8 +222,52 @@ class PropertySerializer(serializers.ModelSerializer):
             # Add new images
             for image in uploaded_images:
                 PropertyImage.objects.create(property=instance, image=image)
+            # The image triggers have moved these since the instance was read
+            if uploaded_images:
+                instance.refresh_from_db(fields=Property.IMAGE_SUMMARY_FIELDS)
                 
             return instance
-        except Exception as e:
-            print(f"Error updating property: {e}")
+        except Exception:
+            logger.exception('Error updating property %s', instance.pk)
             raise
+
+
+class ArchivedPropertyImageSerializer(PropertyImageSerializer):
+    class Meta(PropertyImageSerializer.Meta):
+        model = ArchivedPropertyImage
+
+
+class ArchivedPropertySerializer(serializers.ModelSerializer):
+    """Read-only detail of an archived listing, shaped like PropertySerializer"""
+    images = ArchivedPropertyImageSerializer(many=True, read_only=True)
+    cover_image = serializers.SerializerMethodField()
+    user = UserSerializer(read_only=True)
+    archived = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedProperty
+        fields = '__all__'
+    
+    def get_cover_image(self, obj):
+        images = obj.images.all()
+        return cover_image_url(images[0] if images else None, self.context.get('request'))
+    
+    def get_archived(self, obj):
+        return True
+
+
+class PropertyFeedSerializer(serializers.ModelSerializer):
+    """Flat row format used by the import/export management commands"""
+    
+    class Meta:
+        model = Property
+        fields = [
+            'external_ref', 'title', 'description', 'price', 'surface_area', 'rooms',
+            'bedrooms', 'bathrooms', 'furnished', 'property_type', 'status', 'city',
+            'address', 'postal_code', 'latitude', 'longitude', 'is_active',
+        ]
+        extra_kwargs = {
+            'external_ref': {'required': True, 'allow_blank': False, 'allow_null': False},
+        }
+        # Uniqueness is resolved by the upsert, not by a query per row
+        validators = []
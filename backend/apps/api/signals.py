@@ -0,0 +1,41 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import invalidate_property
+from .middleware import install_query_recorder
+from .models import Property, PropertyImage
+from .storage import add_reference, release_reference
+from .thumbnails import schedule_thumbnails
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Lets PerformanceMiddleware count queries on any thread's connection
+    install_query_recorder(connection)
+
+
+@receiver([post_save, post_delete], sender=Property)
+def property_changed(sender, instance, **kwargs):
+    invalidate_property(instance.pk)
+
+
+@receiver(post_save, sender=PropertyImage)
+def property_image_created(sender, instance, created, **kwargs):
+    if created:
+        add_reference(instance.image.name)
+        schedule_thumbnails(instance.pk)
+
+
+@receiver(post_delete, sender=PropertyImage)
+def property_image_deleted(sender, instance, **kwargs):
+    release_reference(instance.image.name)
+
+
+@receiver([post_save, post_delete], sender=PropertyImage)
+def property_image_changed(sender, instance, **kwargs):
+    # Images are part of the property representation, so they move the
+    # property's updated_at (used for Last-Modified) forward too
+    Property.objects.filter(pk=instance.property_id).update(updated_at=timezone.now())
+    invalidate_property(instance.property_id)
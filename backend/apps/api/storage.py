@@ -0,0 +1,244 @@
+"""
+Content-addressed storage for property photos.
+
+An uploaded image is stored once, under the BLAKE2 hash of its bytes
+(`property_images/blobs/ab/<digest>.jpg`), however many listings use it.
+Each stored file has an ImageBlob row counting the PropertyImage (and
+ArchivedPropertyImage) rows that point at it; when the last one is deleted
+the file and its thumbnails are removed. `collect_garbage` also picks up
+files that a rolled-back save left without a row. Because a name always
+means the same bytes, blob URLs can be cached forever (see
+`views.serve_immutable`).
+"""
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'property_images/blobs'
+DIGEST_SIZE = 32
+BLOB_FILE = re.compile(r'^([0-9a-f]{64})(\.\w+)?$')
+
+
+def image_storage():
+    """Storage for PropertyImage.image, configured as STORAGES['images']"""
+    return storages['images']
+
+
+def blob_grace():
+    # Blobs stored this recently may belong to a PropertyImage that isn't
+    # committed yet, so they're never collected
+    return timedelta(seconds=getattr(settings, 'IMAGE_BLOB_GRACE_SECONDS', 3600))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names saved files after their content. Saving
+    bytes that are already stored returns the existing name without writing
+    anything. Files saved under other names before this storage was used
+    are still opened and served as usual.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import ImageBlob
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name or '')[1].lower()
+
+        with transaction.atomic():
+            blob, created = ImageBlob.objects.select_for_update().get_or_create(
+                digest=digest,
+                defaults={'name': self.blob_name(digest, extension), 'size': size},
+            )
+            if not created:
+                # Refresh updated_at so a collection running now skips it
+                blob.save(update_fields=['updated_at'])
+            if created or not self.exists(blob.name):
+                self.write(blob.name, content)
+        return blob.name
+
+    @staticmethod
+    def blob_name(digest, extension=''):
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+    @staticmethod
+    def is_blob(name):
+        return bool(name) and name.startswith(f'{BLOB_DIR}/')
+
+    def thumbnail_name(self, name, width, extension):
+        """Name of a thumbnail of blob `name`, kept next to it"""
+        stem = os.path.splitext(name)[0]
+        return f'{stem}_{width}w.{extension}'
+
+    def write(self, name, content):
+        """
+        Write `content` to `name` through a temporary file and a rename, so a
+        crash never leaves a partial file under a content-addressed name.
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=self.directory_permissions_mode or 0o777, exist_ok=True)
+        temporary = os.path.join(directory, f'.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(temporary, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def delete_blob(self, name):
+        """Delete a blob and every thumbnail stored beside it"""
+        directory, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        try:
+            _, files = self.listdir(directory)
+        except FileNotFoundError:
+            return
+        for other in files:
+            if other == filename or other.startswith(f'{stem}_'):
+                self.delete(f'{directory}/{other}')
+
+
+def add_reference(name):
+    from .models import ImageBlob
+    if ContentAddressedStorage.is_blob(name):
+        ImageBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release_reference(name):
+    """Drop one reference to blob `name` and collect it if it was the last"""
+    from .models import ImageBlob
+    if not ContentAddressedStorage.is_blob(name):
+        return
+    ImageBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_blob(name))
+
+
+def collect_blob(name, grace=None):
+    """
+    Delete blob `name` if nothing references it and it wasn't stored within
+    the grace period. The image table check is authoritative; the counter
+    only decides when it's worth making. Returns whether it was deleted.
+    """
+    from .models import ImageBlob
+
+    cutoff = timezone.now() - (blob_grace() if grace is None else grace)
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name, ref_count__lte=0, updated_at__lt=cutoff
+        ).first()
+        if blob is None:
+            return False
+        references = count_references(name)
+        if references:
+            ImageBlob.objects.filter(pk=blob.pk).update(ref_count=references)
+            return False
+        blob.delete()
+        # Files go while the row is still locked: a concurrent save of the
+        # same bytes waits for this commit and then writes them afresh
+        image_storage().delete_blob(name)
+    return True
+
+
+def image_models():
+    from .models import ArchivedPropertyImage, PropertyImage
+    return PropertyImage, ArchivedPropertyImage
+
+
+def count_references(name):
+    return sum(model.objects.filter(image=name).count() for model in image_models())
+
+
+def recount_references():
+    """Reset every ref_count from the image rows; returns rows changed"""
+    from .models import ImageBlob
+
+    counted = sum(
+        Coalesce(Subquery(
+            model.objects.filter(image=OuterRef('name'))
+            .order_by().values('image').annotate(total=Count('pk')).values('total')
+        ), 0)
+        for model in image_models()
+    )
+    return ImageBlob.objects.annotate(counted=counted).exclude(ref_count=F('counted')).update(ref_count=counted)
+
+
+def stray_files(cutoff):
+    """
+    Blob files, older than `cutoff`, whose digest has no ImageBlob row. A
+    save rolled back after writing its file leaves one of these behind.
+    """
+    from .models import ImageBlob
+
+    storage = image_storage()
+    try:
+        directories, _ = storage.listdir(BLOB_DIR)
+    except FileNotFoundError:
+        return
+    for directory in directories:
+        found = {}
+        for filename in storage.listdir(f'{BLOB_DIR}/{directory}')[1]:
+            match = BLOB_FILE.match(filename)
+            if match:
+                found[match.group(1)] = f'{BLOB_DIR}/{directory}/{filename}'
+        known = set(ImageBlob.objects.filter(digest__in=found).values_list('digest', flat=True))
+        for digest, name in found.items():
+            if digest not in known and storage.get_modified_time(name) < cutoff:
+                yield digest, name
+
+
+def register_stray_files(grace=None):
+    """
+    Give stray blob files an unreferenced ImageBlob row dated from the file,
+    so collection deletes them under the same row lock as any other blob.
+    Returns how many were registered.
+    """
+    from .models import ImageBlob
+
+    storage = image_storage()
+    cutoff = timezone.now() - (blob_grace() if grace is None else grace)
+    registered = 0
+    for digest, name in stray_files(cutoff):
+        with transaction.atomic():
+            # Waits for, and then defers to, a save of the same bytes in flight
+            _, created = ImageBlob.objects.get_or_create(
+                digest=digest, defaults={'name': name, 'size': storage.size(name)}
+            )
+            if created:
+                ImageBlob.objects.filter(pk=digest).update(updated_at=storage.get_modified_time(name))
+                registered += 1
+    return registered
+
+
+def collect_garbage(grace=None):
+    """Delete every unreferenced blob, and stray blob file, older than the grace period"""
+    from .models import ImageBlob
+
+    register_stray_files(grace)
+    recount_references()
+    cutoff = timezone.now() - (blob_grace() if grace is None else grace)
+    names = ImageBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff).values_list('name', flat=True)
+    return [name for name in names if collect_blob(name, grace)]
@@ -1,3 +1,1212 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.core.files.storage import default_storage
+from django.test import (
+    LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from apps.users.models import User
+from core.log import QueueingHandler, SamplingFilter
+from apps.users.tokens import issue_tokens
+from .caching import LIST_VERSION_KEY, bump_version, invalidate_property
+from .models import ArchivedProperty, ImageBlob, MarketStat, Property, PropertyImage, Upload
+from .market import refresh_market_stats
+from .pagination import KeysetPagination
+from .replicas import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter, lag_checks, use_primary
+from .storage import collect_garbage
+from .uploads import UploadError, append_chunk, temp_path
+from .views import serve_immutable
+
+
+def create_property(user, **kwargs):
+    data = {
+        'title': 'Riad in the medina',
+        'description': 'Traditional riad with a courtyard',
+        'price': 1500000,
+        'surface_area': 180,
+        'rooms': 6,
+        'bedrooms': 4,
+        'bathrooms': 2,
+        'property_type': 'riad',
+        'status': 'for_sale',
+        'city': 'Marrakech',
+        'address': 'Derb Sidi Bouloukat',
+        'user': user,
+    }
+    data.update(kwargs)
+    return Property.objects.create(**data)
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user)["token"]}')
+
+
+class PropertyQueryCountTests(APITestCase):
+    def add_properties(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'owner{User.objects.count()}', password='secret')
+            property = create_property(user)
+            PropertyImage.objects.create(property=property, image=f'property_images/{i}.jpg', is_cover=True)
+            PropertyImage.objects.create(property=property, image=f'property_images/{i}_b.jpg')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_does_not_grow_with_properties(self):
+        self.add_properties(2)
+        small, _ = self.count_queries('/api/properties/')
+        self.add_properties(8)
+        large, response = self.count_queries('/api/properties/')
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_detail_uses_fixed_queries_and_image_ordering(self):
+        self.add_properties(1)
+        property = Property.objects.get()
+        queries, response = self.count_queries(f'/api/properties/{property.pk}/')
+        self.assertEqual(queries, 2)
+        self.assertTrue(response.data['images'][0]['is_cover'])
+
+
+class PropertyCardViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.user)
+        PropertyImage.objects.create(property=self.property, image='property_images/inside.jpg')
+        PropertyImage.objects.create(property=self.property, image='property_images/cover.jpg', is_cover=True)
+
+    def test_card_view_returns_only_cover_image(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/properties/?view=card')
+        self.assertEqual(len(context.captured_queries), 1)
+        card = response.data['results'][0]
+        self.assertTrue(card['cover_image'].endswith('/media/property_images/cover.jpg'))
+        self.assertNotIn('description', card)
+        self.assertNotIn('user', card)
+        self.assertNotIn('images', card)
+
+
+class PropertyImageSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.user)
+
+    def summary(self):
+        self.property.refresh_from_db(fields=Property.IMAGE_SUMMARY_FIELDS)
+        return self.property.cover_image_id, self.property.image_count
+
+    def test_triggers_follow_image_writes(self):
+        first = PropertyImage.objects.create(property=self.property, image='property_images/a.jpg')
+        self.assertEqual(self.summary(), (first.pk, 1))
+
+        second, third = PropertyImage.objects.bulk_create([
+            PropertyImage(property=self.property, image='property_images/b.jpg'),
+            PropertyImage(property=self.property, image='property_images/c.jpg'),
+        ])
+        self.assertEqual(self.summary(), (first.pk, 3))
+
+        # Re-flagging in bulk bypasses the signals but not the triggers
+        PropertyImage.objects.filter(pk=third.pk).update(is_cover=True)
+        self.assertEqual(self.summary(), (third.pk, 3))
+        third.delete()
+        self.assertEqual(self.summary(), (first.pk, 2))
+
+        # A stale in-memory copy isn't written back
+        stale = Property.objects.get(pk=self.property.pk)
+        PropertyImage.objects.filter(pk=first.pk).delete()
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.summary(), (second.pk, 1))
+
+    def test_update_without_images_skips_deferred_and_trigger_fields(self):
+        self.authenticate(self.user)
+        payload = {
+            'title': 'Renamed', 'description': 'Quiet', 'price': 500, 'surface_area': 30, 'rooms': 1,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Hassan', 'is_active': True,
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.put(f'/api/properties/{self.property.pk}/', payload)
+        self.assertEqual(response.status_code, 200)
+        queries = [q['sql'] for q in context.captured_queries]
+        # One read of the listing, no refresh after it, and the trigger keeps search current
+        self.assertEqual(len([sql for sql in queries if sql.startswith('SELECT') and 'FROM "api_property" ' in sql]), 1)
+        self.assertFalse([sql for sql in queries if 'search_vector' in sql])
+        response = self.client.get('/api/properties/?q=renamed')
+        self.assertEqual([p['id'] for p in response.data['results']], [self.property.pk])
+
+    def test_check_command_repairs_drift(self):
+        image = PropertyImage.objects.create(property=self.property, image='property_images/a.jpg')
+        other = create_property(self.user)
+        Property.objects.update(cover_image=None, image_count=7)
+
+        out = StringIO()
+        call_command('check_property_images', stdout=out)
+        self.assertIn('2 properties out of sync', out.getvalue())
+        self.assertEqual(self.summary(), (None, 7))
+
+        call_command('check_property_images', '--repair', stdout=StringIO())
+        self.assertEqual(self.summary(), (image.pk, 1))
+        self.assertEqual(Property.objects.get(pk=other.pk).image_count, 0)
+        out = StringIO()
+        call_command('check_property_images', stdout=out)
+        self.assertIn('in sync', out.getvalue())
+
+
+class PropertyListingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.active = [create_property(self.user, title=f'Listing {i}') for i in range(5)]
+        self.inactive = create_property(self.user, is_active=False)
+
+    def test_public_listing_hides_inactive(self):
+        ids = {p['id'] for p in self.client.get('/api/properties/').data['results']}
+        self.assertNotIn(self.inactive.pk, ids)
+        ids = {p['id'] for p in self.client.get(f'/api/properties/?user={self.user.pk}').data['results']}
+        self.assertIn(self.inactive.pk, ids)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        url, seen = '/api/properties/?page_size=2', []
+        while url:
+            data = self.client.get(url).data
+            seen.extend(p['id'] for p in data['results'])
+            url = data['next']
+        self.assertEqual(sorted(seen), sorted(p.pk for p in self.active))
+
+    def test_explain_command_reports_each_query_shape(self):
+        out = StringIO()
+        call_command('explain_listing_queries', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [row['query'] for row in report],
+            ['newest', 'city', 'city_type_price', 'owner', 'deep_page'],
+        )
+
+
+class PropertyFilterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='owner', password='secret')
+        self.cheap = create_property(user, city='Rabat', price=400000, bedrooms=1, property_type='studio')
+        self.mid = create_property(user, city='Rabat', price=900000, bedrooms=3)
+        self.dear = create_property(user, city='Casablanca', price=2500000, bedrooms=5, furnished=True)
+
+    def ids(self, query):
+        response = self.client.get(f'/api/properties/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [p['id'] for p in response.data['results']]
+
+    def test_filters_combine(self):
+        self.assertEqual(set(self.ids('city=Rabat')), {self.cheap.pk, self.mid.pk})
+        self.assertEqual(self.ids('city=Rabat&min_price=500000'), [self.mid.pk])
+        self.assertEqual(self.ids('bedrooms=3&furnished=true'), [self.dear.pk])
+        self.assertEqual(self.ids('property_type=studio'), [self.cheap.pk])
+        for query in ('min_price=cheap', 'status=gone', 'furnished=maybe', 'ordering=bogus'):
+            self.assertEqual(self.client.get(f'/api/properties/?{query}').status_code, 400, query)
+
+    def test_tampered_cursor_is_not_found(self):
+        for position in (['garbage', '1'], ['10', '99999999999999999999'], [None, '1'], [{}, '1']):
+            cursor = KeysetPagination().encode_cursor(False, position)
+            response = self.client.get(f'/api/properties/?ordering=price_high&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, position)
+
+    def test_cursor_follows_the_requested_ordering(self):
+        url, seen = '/api/properties/?ordering=price_high&page_size=1', []
+        while url:
+            data = self.client.get(url).data
+            seen.extend(p['id'] for p in data['results'])
+            url = data['next']
+        self.assertEqual(seen, [self.dear.pk, self.mid.pk, self.cheap.pk])
+
+
+class PropertySearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='owner', password='secret')
+        self.riad = create_property(user, title='Riad à Fès', city='Fès')
+        self.villa = create_property(user, title='Villa with pool', city='Agadir', property_type='villa',
+                                     description='Sea view')
+
+    def test_search_matches_without_accents(self):
+        response = self.client.get('/api/properties/?q=fes')
+        self.assertEqual([p['id'] for p in response.data['results']], [self.riad.id])
+
+    def test_search_ranks_title_matches_first(self):
+        create_property(self.riad.user, title='Apartment', description='Close to a villa')
+        response = self.client.get('/api/properties/?q=villa')
+        self.assertEqual(response.data['results'][0]['id'], self.villa.id)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_relevance_ordering_requires_query(self):
+        response = self.client.get('/api/properties/?ordering=relevance')
+        self.assertEqual(response.status_code, 400)
+
+
+class PropertyGeoTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='owner', password='secret')
+        # Jemaa el-Fnaa, Majorelle garden (~3 km away) and Casablanca (~215 km away)
+        self.medina = create_property(user, latitude='31.625900', longitude='-7.989100')
+        self.gueliz = create_property(user, latitude='31.641600', longitude='-8.003200')
+        self.casa = create_property(user, city='Casablanca', latitude='33.573100', longitude='-7.589800')
+
+    def test_near_orders_by_distance(self):
+        response = self.client.get('/api/properties/?near=31.6258,-7.9891&radius_km=5&ordering=distance')
+        results = response.data['results']
+        self.assertEqual([p['id'] for p in results], [self.medina.id, self.gueliz.id])
+        self.assertLess(results[0]['distance_km'], 0.1)
+        self.assertAlmostEqual(results[1]['distance_km'], 2.2, delta=0.3)
+
+    def test_bbox(self):
+        response = self.client.get('/api/properties/?bbox=-8.1,31.5,-7.9,31.7')
+        self.assertEqual({p['id'] for p in response.data['results']}, {self.medina.id, self.gueliz.id})
+        self.assertNotIn('distance_km', response.data['results'][0])
+
+    def test_invalid_near(self):
+        self.assertEqual(self.client.get('/api/properties/?near=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/?ordering=distance').status_code, 400)
+
+
+class PropertyClusterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='owner', password='secret')
+        create_property(user, price=900000, latitude='31.625900', longitude='-7.989100')
+        create_property(user, price=1200000, latitude='31.626500', longitude='-7.988000')
+        create_property(user, price=500000, property_type='villa', latitude='33.573100', longitude='-7.589800')
+
+    def test_clusters_aggregate_per_cell(self):
+        response = self.client.get('/api/properties/clusters/?bbox=-9,31,-7,34&zoom=8')
+        clusters = sorted(response.data['clusters'], key=lambda c: c['count'])
+        self.assertEqual([c['count'] for c in clusters], [1, 2])
+        self.assertEqual(clusters[1]['min_price'], '900000.00')
+        self.assertEqual(clusters[1]['max_price'], '1200000.00')
+
+    def test_clusters_respect_filters_and_cache_tiles(self):
+        url = '/api/properties/clusters/?bbox=-9,31,-7,34&zoom=8&property_type=villa'
+        self.assertEqual(len(self.client.get(url).data['clusters']), 1)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_clusters_require_viewport(self):
+        self.assertEqual(self.client.get('/api/properties/clusters/?zoom=3').status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/clusters/?bbox=-9,31,-7,34').status_code, 400)
+
+    def test_clusters_reject_oversized_or_invalid_boxes(self):
+        for query in ('bbox=-180,-90,180,90&zoom=20', 'bbox=-7,31,-9,34&zoom=8', 'bbox=-9,31,-7,95&zoom=8'):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f'/api/properties/clusters/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertEqual(len(context.captured_queries), 0, query)
+
+
+class PropertyFacetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        create_property(self.user, price=900000, bedrooms=2)
+        create_property(self.user, price=1200000, bedrooms=3, furnished=True)
+        create_property(self.user, city='Rabat', price=300000, bedrooms=6, property_type='villa', status='for_rent')
+        create_property(self.user, city='Rabat', is_active=False)
+
+    def test_counts_per_facet_in_one_query(self):
+        with CaptureQueriesContext(connection) as context:
+            facets = self.client.get('/api/properties/facets/').data
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(facets['city'], [{'value': 'Marrakech', 'count': 2}, {'value': 'Rabat', 'count': 1}])
+        self.assertEqual(facets['property_type'][0], {'value': 'riad', 'label': 'Riad', 'count': 2})
+        self.assertEqual(facets['furnished'], [{'value': False, 'count': 2}, {'value': True, 'count': 1}])
+        self.assertEqual(facets['price'], [
+            {'min': 0, 'max': 500000, 'count': 1}, {'min': 500000, 'max': 1000000, 'count': 1},
+            {'min': 1000000, 'max': 2000000, 'count': 1},
+        ])
+        self.assertEqual([(b['min'], b['max']) for b in facets['bedrooms']], [(2, 3), (3, 4), (5, None)])
+
+    def test_a_facet_ignores_its_own_filter(self):
+        facets = self.client.get('/api/properties/facets/?city=Rabat&max_price=1000000').data
+        self.assertEqual(facets['total'], 1)
+        # Other cities stay selectable, narrowed by the price filter only
+        self.assertEqual(facets['city'], [{'value': 'Marrakech', 'count': 1}, {'value': 'Rabat', 'count': 1}])
+        self.assertEqual(facets['property_type'], [{'value': 'villa', 'label': 'Villa', 'count': 1}])
+        self.assertEqual(len(facets['price']), 1)
+
+    def test_cached_until_a_listing_changes(self):
+        self.client.get('/api/properties/facets/')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/properties/facets/?view=card')
+        self.assertEqual(len(context.captured_queries), 0)
+
+        create_property(self.user, city='Fes')
+        facets = self.client.get('/api/properties/facets/').data
+        self.assertEqual(facets['total'], 4)
+        self.assertEqual(self.client.get('/api/properties/facets/?status=bogus').status_code, 400)
+
+
+class MarketStatTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        # Price per m2: 10000, 20000, 30000
+        for price in (1000000, 2000000, 3000000):
+            create_property(self.user, price=price, surface_area=100)
+        self.rabat = create_property(self.user, city='Rabat', price=800000, surface_area=100)
+
+    def backdate(self):
+        """Pretend every write happened before the last refresh"""
+        Property.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+    def test_percentiles_served_read_only(self):
+        self.assertEqual(refresh_market_stats(), (2, 0))
+        stats = self.client.get('/api/market-stats/?city=Marrakech').data
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0]['listing_count'], 3)
+        self.assertEqual(stats[0]['median_price'], '2000000.00')
+        self.assertEqual(stats[0]['p25_price_per_m2'], '15000.00')
+        self.assertEqual(stats[0]['median_price_per_m2'], '20000.00')
+        self.assertEqual(self.client.get('/api/market-stats/?status=bogus').status_code, 400)
+        self.assertEqual(self.client.post('/api/market-stats/').status_code, 405)
+
+    def test_incremental_refresh_only_touches_changed_groups(self):
+        refresh_market_stats()
+        self.backdate()
+        self.assertEqual(refresh_market_stats(), (0, 0))
+
+        create_property(self.user, price=4000000, surface_area=100)
+        self.assertEqual(refresh_market_stats(), (1, 0))
+        self.assertEqual(MarketStat.objects.get(city='Marrakech').listing_count, 4)
+
+        # Leaving a group is caught by the trigger, not updated_at
+        self.backdate()
+        Property.objects.filter(city='Marrakech', price=4000000).update(city='Rabat')
+        self.assertTrue(MarketStat.objects.get(city='Marrakech').stale)
+        self.assertEqual(refresh_market_stats(), (2, 0))
+        self.assertEqual(MarketStat.objects.get(city='Marrakech').listing_count, 3)
+        self.assertEqual(MarketStat.objects.get(city='Rabat').listing_count, 2)
+        self.assertFalse(MarketStat.objects.filter(stale=True).exists())
+
+        self.backdate()
+        Property.objects.filter(city='Rabat').delete()
+        self.assertEqual(refresh_market_stats(), (0, 1))
+        self.assertFalse(MarketStat.objects.filter(city='Rabat').exists())
+
+
+class PropertyResponseCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.user)
+
+    def test_list_is_served_from_cache_until_a_property_changes(self):
+        self.client.get('/api/properties/')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/properties/')
+        self.assertEqual(len(context.captured_queries), 0)
+
+        self.property.title = 'Renovated riad'
+        self.property.save()
+        response = self.client.get('/api/properties/')
+        self.assertEqual(response.data['results'][0]['title'], 'Renovated riad')
+
+    def test_detail_invalidated_by_new_image(self):
+        url = f'/api/properties/{self.property.pk}/'
+        self.assertEqual(self.client.get(url).data['images'], [])
+        PropertyImage.objects.create(property=self.property, image='property_images/new.jpg')
+        self.assertEqual(len(self.client.get(url).data['images']), 1)
+
+    def test_conditional_requests(self):
+        url = f'/api/properties/{self.property.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        list_response = self.client.get('/api/properties/')
+        self.assertNotIn('Last-Modified', list_response)
+        response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=list_response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.property.save()
+        response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=list_response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        # A listing leaving the page doesn't make the page look older
+        self.property.soft_delete()
+        invalidate_property(self.property.pk)
+        response = self.client.get('/api/properties/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual((response.status_code, response.data['results']), (200, []))
+
+
+def make_upload(name='photo.jpg', size=(1200, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 120, 60)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ThumbnailTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.user)
+
+    def test_upload_generates_srcset_and_card_cover(self):
+        with override_settings(MEDIA_ROOT=self.media_root, THUMBNAILS_SYNC=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                image = PropertyImage.objects.create(property=self.property, image=make_upload(), is_cover=True)
+            image.refresh_from_db()
+            self.assertEqual(sorted(image.thumbnails['webp']), ['1200', '400', '800'])
+
+            detail = self.client.get(f'/api/properties/{self.property.pk}/').data
+            srcset = detail['images'][0]['srcset']['webp']
+            self.assertIn('_400w.webp 400w', srcset)
+            self.assertIn('_1200w.webp 1200w', srcset)
+
+            card = self.client.get('/api/properties/?view=card').data['results'][0]
+            self.assertTrue(card['cover_image'].endswith('_400w.webp'))
+
+    def test_image_urls_come_from_the_image_storage(self):
+        storage = PropertyImage._meta.get_field('image').storage
+        with override_settings(MEDIA_ROOT=self.media_root, THUMBNAILS_SYNC=True), \
+                mock.patch.object(storage, 'base_url', 'https://images.example.com/'):
+            with self.captureOnCommitCallbacks(execute=True):
+                PropertyImage.objects.create(property=self.property, image=make_upload(), is_cover=True)
+
+            detail = self.client.get(f'/api/properties/{self.property.pk}/').data
+            self.assertTrue(detail['images'][0]['srcset']['webp'].startswith('https://images.example.com/'))
+            card = self.client.get('/api/properties/?view=card').data['results'][0]
+            self.assertTrue(card['cover_image'].startswith('https://images.example.com/'))
+
+
+class ResumableUploadTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(shutil.rmtree, self.upload_dir)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, UPLOAD_TEMP_DIR=self.upload_dir, THUMBNAILS_SYNC=True
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.owner = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.owner)
+        self.authenticate(self.owner)
+
+    def start(self, content, name='photo.jpg'):
+        response = self.client.post('/api/uploads/', {'filename': name, 'size': len(content)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f'/api/uploads/{response.data["id"]}/', response.data['id']
+
+    def send(self, url, offset, chunk):
+        return self.client.generic(
+            'PATCH', url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunked_upload_resumes_and_attaches(self):
+        content = make_upload().read()
+        url, upload_id = self.start(content)
+        half = len(content) // 2
+
+        response = self.send(url, 0, content[:half])
+        self.assertEqual(response['Upload-Offset'], str(half))
+        # A retry of the first chunk is refused with the offset to resume from
+        self.assertEqual(self.send(url, 0, content[:half]).status_code, 409)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], str(half))
+        response = self.send(url, half, content[half:])
+        self.assertTrue(response.data['complete'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/properties/{self.property.pk}/images/',
+                {'uploads': [upload_id], 'cover': upload_id}, format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        image = PropertyImage.objects.get(property=self.property)
+        self.assertTrue(image.is_cover)
+        with image.image.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_incomplete_or_invalid_uploads_are_not_attached(self):
+        url, upload_id = self.start(b'not an image at all', name='fake.jpg')
+        attach_url = f'/api/properties/{self.property.pk}/images/'
+        response = self.client.post(attach_url, {'uploads': [upload_id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.send(url, 0, b'not an image at all')
+        response = self.client.post(attach_url, {'uploads': [upload_id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not a valid image', response.data['error'])
+        self.assertFalse(PropertyImage.objects.exists())
+
+    def test_a_chunk_racing_another_to_the_same_offset_is_refused(self):
+        url, upload_id = self.start(b'0123456789')
+        stale = Upload.objects.get(pk=upload_id)
+        self.send(url, 0, b'01234')
+
+        with self.assertRaises(UploadError) as raised:
+            append_chunk(stale, 0, io.BytesIO(b'abcde'), 5)
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertEqual(Upload.objects.get(pk=upload_id).offset, 5)
+        self.send(url, 5, b'56789')
+        with open(temp_path(upload_id), 'rb') as f:
+            self.assertEqual(f.read(), b'0123456789')
+
+    def test_uploads_are_private_and_bounded(self):
+        url, _ = self.start(b'12345')
+        self.assertEqual(self.send(url, 0, b'123456').status_code, 413)
+        response = self.client.post('/api/uploads/', {'filename': 'notes.txt', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = User.objects.create_user(username='other', password='secret')
+        self.authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ImageBlobStorageTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, THUMBNAILS_SYNC=True, IMAGE_BLOB_GRACE_SECONDS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='owner', password='secret')
+
+    def add_image(self, property, name='photo.jpg', size=(1200, 900)):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = PropertyImage.objects.create(property=property, image=make_upload(name, size))
+        image.refresh_from_db()
+        return image
+
+    def test_identical_uploads_share_one_file_until_the_last_is_deleted(self):
+        first = self.add_image(create_property(self.user))
+        second = self.add_image(create_property(self.user, title='Same photo'), name='copy.jpg')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^property_images/blobs/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(first.thumbnails, second.thumbnails)
+        blob = ImageBlob.objects.get()
+        self.assertEqual((blob.name, blob.ref_count), (first.image.name, 2))
+        blob_dir = os.path.dirname(first.image.path)
+        files = len(os.listdir(blob_dir))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.property.delete()
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertEqual(len(os.listdir(blob_dir)), files)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertEqual(os.listdir(blob_dir), [])
+
+    def test_blobs_are_served_as_immutable(self):
+        image = self.add_image(create_property(self.user))
+        request = RequestFactory().get('/')
+        response = serve_immutable(request, image.image.name, document_root=self.media_root)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_collect_command_adopts_legacy_files_and_drops_orphans(self):
+        property = create_property(self.user)
+        legacy_name = default_storage.save('property_images/old.jpg', make_upload())
+        legacy = PropertyImage.objects.bulk_create([PropertyImage(property=property, image=legacy_name)])[0]
+        orphan = self.add_image(create_property(self.user), size=(640, 480))
+        PropertyImage.objects.filter(pk=orphan.pk).delete()  # skips the signals
+
+        call_command('collect_image_blobs', '--adopt', stdout=StringIO())
+        legacy.refresh_from_db()
+        self.assertTrue(legacy.image.name.startswith('property_images/blobs/'))
+        self.assertTrue(legacy.thumbnails)
+        self.assertFalse(default_storage.exists(legacy_name))
+        self.assertFalse(os.path.exists(orphan.image.path))
+        self.assertEqual(list(ImageBlob.objects.values_list('name', 'ref_count')), [(legacy.image.name, 1)])
+
+
+    def test_collection_removes_files_whose_save_rolled_back(self):
+        property = create_property(self.user)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            image = PropertyImage.objects.create(property=property, image=make_upload())
+            raise RuntimeError
+        self.assertTrue(os.path.exists(image.image.path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+        collect_garbage(grace=timedelta(hours=1))
+        self.assertTrue(os.path.exists(image.image.path))
+        collect_garbage()
+        self.assertFalse(os.path.exists(image.image.path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+
+class PropertyArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, THUMBNAILS_SYNC=True, IMAGE_BLOB_GRACE_SECONDS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.owner = User.objects.create_user(username='owner', password='secret')
+
+    def archive(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_properties', stdout=out)
+        return out.getvalue()
+
+    def test_delete_hides_the_listing_until_it_is_purged(self):
+        property = create_property(self.owner)
+        url = f'/api/properties/{property.pk}/'
+        self.authenticate(self.owner)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get('/api/properties/', {'user': self.owner.pk}).data['results'], [])
+        self.assertFalse(Property.objects.filter(pk=property.pk).exists())
+        self.assertIsNotNone(Property.all_objects.get(pk=property.pk).deleted_at)
+
+        self.archive()
+        self.assertTrue(Property.all_objects.filter(pk=property.pk).exists())
+        Property.all_objects.filter(pk=property.pk).update(deleted_at=timezone.now() - timedelta(days=31))
+        self.assertIn('Purged 1', self.archive())
+        self.assertFalse(Property.all_objects.filter(pk=property.pk).exists())
+        self.assertFalse(ArchivedProperty.objects.exists())
+
+    def test_closed_listings_move_to_the_archive_and_keep_their_images(self):
+        sold = create_property(self.owner, status='sold')
+        with self.captureOnCommitCallbacks(execute=True):
+            image = PropertyImage.objects.create(property=sold, image=make_upload(), is_cover=True)
+        image.refresh_from_db()
+        recent = create_property(self.owner, status='rented')
+        Property.objects.filter(pk=sold.pk).update(updated_at=timezone.now() - timedelta(days=200))
+
+        self.assertIn('archived 1', self.archive())
+        self.assertEqual(list(Property.objects.values_list('pk', flat=True)), [recent.pk])
+        archived = ArchivedProperty.objects.get()
+        self.assertEqual((archived.pk, archived.status), (sold.pk, 'sold'))
+
+        response = self.client.get(f'/api/properties/{sold.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(response.data['title'], sold.title)
+        self.assertEqual(len(response.data['images']), 1)
+        self.assertTrue(response.data['images'][0]['image'].endswith(image.image.name))
+        self.assertTrue(response.data['cover_image'])
+
+        # The archive keeps the file referenced
+        collect_garbage()
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(image.image.path))
+
+
+class PropertyFeedCommandTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='agency', password='secret')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_feed(self, name, content):
+        path = f'{self.directory}/{name}'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_import_upserts_on_external_ref(self):
+        header = 'external_ref,title,description,price,surface_area,rooms,bedrooms,bathrooms,property_type,status,city,address\n'
+        path = self.write_feed('feed.csv', header + (
+            'R-1,Riad,Courtyard,100000,120,5,3,2,riad,for_sale,Fès,Batha\n'
+            'R-2,Villa,Pool,900000,300,8,5,4,villa,for_sale,Agadir,Founty\n'
+            'R-3,Broken,Bad row,-1,10,1,1,1,castle,for_sale,Rabat,Agdal\n'
+        ))
+        call_command('import_properties', path, user='agency', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Property.objects.filter(user=self.user).count(), 2)
+
+        path = self.write_feed('update.jsonl', (
+            '{"external_ref": "R-1", "title": "Riad renovated", "description": "Courtyard", "price": "120000",'
+            ' "surface_area": 120, "rooms": 5, "bedrooms": 3, "bathrooms": 2, "property_type": "riad",'
+            ' "status": "sold", "city": "Fès", "address": "Batha"}\n'
+        ))
+        call_command('import_properties', path, user='agency', stdout=StringIO(), stderr=StringIO())
+        riad = Property.objects.get(user=self.user, external_ref='R-1')
+        self.assertEqual((riad.title, riad.status), ('Riad renovated', 'sold'))
+        self.assertEqual(Property.objects.count(), 2)
+
+    def test_export_streams_jsonl(self):
+        create_property(self.user, external_ref='R-9')
+        out = StringIO()
+        call_command('export_properties', '-', format='jsonl', stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(rows[0]['external_ref'], 'R-9')
+
+
+class BenchmarkCommandTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+
+    def test_seed_properties_is_repeatable_and_covers_every_type(self):
+        with self.settings(MEDIA_ROOT=self.media):
+            call_command('seed_properties', '--count', '300', '--users', '5', '--seed', '7', stdout=StringIO())
+        self.assertEqual(Property.objects.count(), 300)
+        self.assertEqual(User.objects.filter(username__startswith='seed-user-').count(), 5)
+        self.assertEqual(
+            set(Property.objects.values_list('property_type', flat=True)),
+            set(dict(Property.PROPERTY_TYPE_CHOICES)),
+        )
+        self.assertTrue(PropertyImage.objects.exists())
+        first = list(Property.objects.order_by('external_ref').values_list('external_ref', 'city', 'price')[:20])
+
+        with self.settings(MEDIA_ROOT=self.media):
+            call_command(
+                'seed_properties', '--count', '300', '--users', '5', '--seed', '7', '--clear', stdout=StringIO()
+            )
+        again = list(Property.objects.order_by('external_ref').values_list('external_ref', 'city', 'price')[:20])
+        self.assertEqual(first, again)
+
+    def test_benchmark_report(self):
+        with self.settings(MEDIA_ROOT=self.media):
+            call_command('seed_properties', '--count', '30', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark_api', '--iterations', '2', '--warmup', '0', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            set(report['scenarios']),
+            {'list', 'list_cached', 'list_card', 'list_filtered', 'detail', 'detail_cached', 'create', 'login'},
+        )
+        self.assertEqual(report['scenarios']['list_cached']['queries']['max'], 0)
+        self.assertGreater(report['scenarios']['detail']['bytes']['median'], 0)
+        self.assertIn('p95', report['scenarios']['login']['latency_ms'])
+        # The benchmark account and everything it created are removed again
+        self.assertFalse(User.objects.filter(username='api-benchmark').exists())
+        self.assertEqual(Property.objects.count(), 30)
+
+
+class PerformanceMiddlewareTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(f'/api/properties/{self.property.pk}/')
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('render;dur=', timing)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/properties/')
+        response = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="api/properties/",le="+Inf"}', body)
+        self.assertIn('http_requests_total{method="GET",route="api/properties/",status="200"}', body)
+
+        # Local addresses, as behind a reverse proxy, aren't enough
+        self.assertEqual(self.client.get('/api/_metrics', REMOTE_ADDR='127.0.0.1').status_code, 404)
+        response = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer guess')
+        self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_query_budget_is_flagged(self):
+        with self.assertLogs('apps.api.performance', 'WARNING') as logs:
+            self.client.get(f'/api/properties/{self.property.pk}/')
+        self.assertIn('issued 2 queries (budget 1)', logs.output[0])
+        self.assertEqual(logs.records[0].request_metrics['db_queries'], 2)
+
+
+class LoggingTests(TestCase):
+    def make_logger(self, handler):
+        logger = logging.getLogger('apps.api.tests.logging')
+        logger.handlers, logger.propagate = [handler], False
+        logger.setLevel(logging.DEBUG)
+        self.addCleanup(setattr, logger, 'handlers', [])
+        return logger
+
+    def test_payload_is_redacted_and_snapshotted(self):
+        stream = StringIO()
+        handler = QueueingHandler(stream=stream)
+        logger = self.make_logger(handler)
+        payload = {
+            'title': 'Riad',
+            'password': 'hunter2',
+            'uploaded_images': [SimpleUploadedFile('a.jpg', b'x' * 2048)],
+        }
+        logger.info('payload %s', payload, extra={'headers': {'Authorization': 'Bearer abc'}})
+        payload['title'] = 'changed after logging'
+        handler.close()
+
+        record = json.loads(stream.getvalue())
+        self.assertIn("'title': 'Riad'", record['message'])
+        self.assertIn("'password': '[REDACTED]'", record['message'])
+        self.assertIn("<file 'a.jpg' 2048 bytes>", record['message'])
+        self.assertNotIn('hunter2', stream.getvalue())
+        self.assertEqual(record['headers'], {'Authorization': '[REDACTED]'})
+
+    def test_sampling_keeps_warnings(self):
+        stream = StringIO()
+        handler = QueueingHandler(stream=stream)
+        handler.addFilter(SamplingFilter({'apps.api.tests': 0}))
+        logger = self.make_logger(handler)
+        logger.info('dropped')
+        logger.warning('kept')
+        handler.close()
+        self.assertEqual([json.loads(line)['message'] for line in stream.getvalue().splitlines()], ['kept'])
+
+
+class PropertyBatchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        self.properties = [create_property(self.user, title=f'Listing {i}') for i in range(5)]
+        self.authenticate(self.user)
+
+    def post(self, payload):
+        return self.client.post('/api/properties/batch/', payload, format='json')
+
+    def test_status_change_is_a_single_update(self):
+        operations = [{'op': 'update', 'id': p.pk, 'data': {'status': 'rented'}} for p in self.properties]
+        with CaptureQueriesContext(connection) as context:
+            response = self.post({'operations': operations})
+        self.assertEqual(response.status_code, 200)
+        updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "api_property"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Property.objects.filter(status='rented').count(), 5)
+
+    def test_partial_failure(self):
+        data = {
+            'title': 'New', 'description': 'New listing', 'price': 1000, 'surface_area': 40, 'rooms': 2,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Agdal',
+        }
+        response = self.post({'operations': [
+            {'op': 'create', 'data': data},
+            {'op': 'update', 'id': self.properties[0].pk, 'data': {'price': -1}},
+            {'op': 'delete', 'id': self.properties[1].pk},
+            {'op': 'delete', 'id': 999999},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], [201, 400, 204, 404])
+        self.assertTrue(Property.objects.filter(title='New').exists())
+        self.assertFalse(Property.objects.filter(pk=self.properties[1].pk).exists())
+
+    def test_atomic_batch_rejects_everything(self):
+        response = self.post({'atomic': True, 'operations': [
+            {'op': 'delete', 'id': self.properties[0].pk},
+            {'op': 'update', 'id': self.properties[1].pk, 'data': {'status': 'gone'}},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Property.objects.count(), 5)
+
+    def test_malformed_ids_are_rejected_per_item(self):
+        pk = self.properties[0].pk
+        response = self.post({'operations': [
+            {'op': 'delete', 'id': [pk]},
+            {'op': 'delete', 'id': True},
+            {'op': 'update', 'id': str(pk), 'data': {'status': 'rented'}},
+            {'op': 'delete', 'id': pk},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], [400, 400, 400, 204])
+
+    def test_duplicate_external_refs_are_rejected_per_item(self):
+        Property.objects.filter(pk=self.properties[0].pk).update(external_ref='A-1')
+        data = {
+            'title': 'New', 'description': 'New listing', 'price': 1000, 'surface_area': 40, 'rooms': 2,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Agdal',
+        }
+        response = self.post({'operations': [
+            {'op': 'create', 'data': {**data, 'external_ref': 'B-1'}},
+            {'op': 'create', 'data': {**data, 'external_ref': 'B-1'}},
+            {'op': 'create', 'data': {**data, 'external_ref': 'A-1'}},
+            {'op': 'update', 'id': self.properties[1].pk, 'data': {'external_ref': 'A-1'}},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], [201, 400, 400, 400])
+        self.assertEqual(Property.objects.filter(external_ref='B-1').count(), 1)
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='owner', password='secret')
+        self.property = create_property(self.owner)
+        PropertyImage.objects.create(property=self.property, image='property_images/cover.jpg', is_cover=True)
+
+    async def test_list_and_detail_through_asgi(self):
+        response = await self.async_client.get('/api/properties/', {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.json()['results']], [self.property.pk])
+        # Queries run on the ORM's thread, not the event loop's, and still count
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+        response = await self.async_client.get(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['images']), 1)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        cached = await self.async_client.get(
+            f'/api/properties/{self.property.pk}/', headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        response = await self.async_client.get('/api/properties/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/properties/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_login_through_asgi(self):
+        response = await self.async_client.post(
+            '/api/login/', {'username': 'owner', 'password': 'secret'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+        response = await self.async_client.post(
+            '/api/login/', {'username': 'owner', 'password': 'wrong'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_login_rejects_a_non_object_body(self):
+        response = await self.async_client.post(
+            '/api/login/', ['owner', 'secret'], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_login_only_accepts_post(self):
+        response = await self.async_client.get('/api/login/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'POST')
+
+    async def test_responses_are_negotiated(self):
+        response = await self.async_client.get('/api/properties/', headers={'accept': 'application/xml'})
+        self.assertEqual(response.status_code, 406)
+        response = await self.async_client.get('/api/properties/', headers={'accept': 'text/html,*/*;q=0.8'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    async def test_writes_fall_through_to_sync_views(self):
+        response = await self.async_client.delete(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG_SECONDS=5, REPLICA_LAG_CHECK_SECONDS=60)
+class ReplicaRoutingTests(SimpleTestCase):
+    # Outside TestCase's wrapping transaction, which keeps reads on the primary
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(lag_checks.clear)
+        self.set_lag(0.5)
+        self.router = ReplicaRouter()
+
+    def set_lag(self, lag):
+        lag_checks['replica1'] = (time.monotonic(), lag)
+
+    def test_reads_use_replicas_that_keep_up(self):
+        self.assertEqual(self.router.db_for_read(Property), 'replica1')
+        self.assertEqual(self.router.db_for_write(Property), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Property), 'default')
+        self.set_lag(30)
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+        self.set_lag(None)  # unreachable
+        self.assertEqual(self.router.db_for_read(Property), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+
+    def test_writers_read_their_writes(self):
+        middleware = ReplicaMiddleware(lambda request: HttpResponse(self.router.db_for_read(Property)))
+        factory = RequestFactory()
+        token = f'Bearer {issue_tokens(User(pk=1, username="owner"))["token"]}'
+
+        self.assertEqual(middleware(factory.get('/api/properties/', HTTP_AUTHORIZATION=token)).content, b'replica1')
+        response = middleware(factory.post('/api/properties/', HTTP_AUTHORIZATION=token))
+        self.assertEqual(response.content, b'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The same token sticks to the primary without the cookie, and so does the cookie without a token
+        self.assertEqual(middleware(factory.get('/api/properties/', HTTP_AUTHORIZATION=token)).content, b'default')
+        request = factory.get('/api/properties/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'default')
+        self.assertEqual(middleware(factory.get('/api/properties/')).content, b'replica1')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRequestTests(TransactionTestCase):
+    """Requests against a `replica1` alias mirroring the test database, as DB_REPLICA_HOSTS sets up"""
+
+    @classmethod
+    def setUpClass(cls):
+        # The runner set up the databases before this alias existed, so it's
+        # added here: a second connection to the test database
+        connections.settings['replica1'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        cls.addClassCleanup(connections.settings.pop, 'replica1')
+        cls.addClassCleanup(connections.close_all)
+        cls.databases = {'default', 'replica1'}
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(lag_checks.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='owner', password='secret')
+        create_property(self.user)
+
+    def list_reads(self):
+        """Aliases the listing was read from"""
+        # Skip the response cache, but keep the writer's pin stored beside it
+        bump_version(LIST_VERSION_KEY)
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in ('default', 'replica1')
+            }
+            response = self.client.get('/api/properties/')
+        self.assertEqual(response.status_code, 200)
+        return [
+            alias for alias, context in contexts.items()
+            if any('FROM "api_property" ' in query['sql'] for query in context.captured_queries)
+        ]
+
+    def test_list_reads_move_to_the_primary_after_a_write(self):
+        self.assertEqual(self.list_reads(), ['replica1'])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.user)["token"]}')
+        response = self.client.post('/api/properties/', {
+            'title': 'Studio', 'description': 'Small', 'price': 500, 'surface_area': 30, 'rooms': 1,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Hassan',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.list_reads(), ['default'])
+        # The token alone keeps the writer on the primary, without the cookie
+        self.client.cookies.clear()
+        self.assertEqual(self.list_reads(), ['default'])
+
+        self.client.credentials()
+        self.assertEqual(self.list_reads(), ['replica1'])
+
+
+class BenchmarkServersTests(LiveServerTestCase):
+    def test_report_against_live_server(self):
+        user = User.objects.create_user(username='owner', password='secret')
+        create_property(user)
+        out = StringIO()
+        call_command(
+            'benchmark_servers', '--target', f'live={self.live_server_url}', '--duration', '1',
+            '--fast-clients', '2', '--slow-clients', '1', stdout=out, stderr=StringIO(),
+        )
+        fast = json.loads(out.getvalue())['targets']['live']['fast']
+        self.assertGreater(fast['requests'], 0)
+        self.assertEqual(fast['errors'], 0)
+        self.assertEqual(set(fast['statuses']), {'200'})
+
+
+class TokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+        self.property = create_property(self.owner)
+
+    def test_login_issues_tokens(self):
+        response = self.client.post('/api/login/', {'username': 'owner', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
+
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertIn('token', refreshed.data)
+
+    def test_token_is_verified_without_queries(self):
+        self.authenticate(self.owner)
+        cache.clear()
+        self.client.get(f'/api/properties/{self.property.pk}/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_writes_require_owner(self):
+        url = f'/api/properties/{self.property.pk}/'
+        self.assertEqual(self.client.delete(url).status_code, 401)
+        self.authenticate(self.other)
+        self.assertEqual(self.client.delete(url).status_code, 403)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer tampered')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.authenticate(self.owner)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+
+    def test_create_ignores_foreign_user_id(self):
+        self.authenticate(self.other)
+        response = self.client.post('/api/properties/', {
+            'title': 'Studio', 'description': 'Small', 'price': 500, 'surface_area': 30, 'rooms': 1,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Hassan', 'user_id': self.owner.pk,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Property.objects.get(pk=response.data['id']).user_id, self.other.pk)
+
+    def test_duplicate_external_ref_is_rejected_per_owner(self):
+        payload = {
+            'title': 'Studio', 'description': 'Small', 'price': 500, 'surface_area': 30, 'rooms': 1,
+            'bedrooms': 1, 'bathrooms': 1, 'property_type': 'studio', 'status': 'for_rent',
+            'city': 'Rabat', 'address': 'Hassan', 'external_ref': 'A-1',
+        }
+        self.authenticate(self.owner)
+        self.assertEqual(self.client.post('/api/properties/', payload).status_code, 201)
+        response = self.client.post('/api/properties/', payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('external_ref', response.data)
+        response = self.client.put(f'/api/properties/{self.property.pk}/', {**payload, 'title': 'Renamed'})
+        self.assertEqual(response.status_code, 400)
+
+        self.authenticate(self.other)
+        self.assertEqual(self.client.post('/api/properties/', payload).status_code, 201)
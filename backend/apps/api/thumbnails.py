@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .replicas import use_primary
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+# Named sizes used by the frontend, as target widths in pixels
+THUMBNAIL_WIDTHS = {
+    'card': 400,
+    'gallery': 800,
+    'full': 1600,
+}
+
+THUMBNAIL_DIR = 'property_images/thumbnails'
+
+# format -> (Pillow format name, file extension, save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+if features.check('avif'):
+    THUMBNAIL_FORMATS['avif'] = ('AVIF', 'avif', {'quality': 60})
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule_thumbnails(image_id):
+    """
+    Queue thumbnail generation for a PropertyImage once the current
+    transaction commits. With THUMBNAILS_SYNC it runs inline (tests, scripts).
+    """
+    if getattr(settings, 'THUMBNAILS_SYNC', False):
+        transaction.on_commit(lambda: generate_thumbnails(image_id))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_in_worker, image_id))
+
+
+def run_in_worker(image_id):
+    close_old_connections()
+    try:
+        generate_thumbnails(image_id)
+    except Exception:
+        logger.exception('Thumbnail generation failed for PropertyImage %s', image_id)
+    finally:
+        close_old_connections()
+
+
+# Runs right after the image is committed, before a replica may have it
+@use_primary()
+def generate_thumbnails(image_id):
+    """Render every size/format for one image and record them on the row"""
+    from .models import PropertyImage
+
+    try:
+        property_image = PropertyImage.objects.get(pk=image_id)
+    except PropertyImage.DoesNotExist:
+        return
+
+    storage = property_image.image.storage
+    source_name = property_image.image.name
+    # Content-addressed images keep their thumbnails beside the blob under
+    # fixed names, so every listing sharing a photo shares them too
+    shared = thumbnail_storage(property_image.image) is storage
+    if shared:
+        existing = (
+            PropertyImage.objects.filter(image=source_name).exclude(thumbnails={})
+            .values_list('thumbnails', flat=True).first()
+        )
+        if existing and all(storage.exists(name) for sizes in existing.values() for name in sizes.values()):
+            return record_thumbnails(property_image, existing)
+
+    with storage.open(source_name, 'rb') as f:
+        source = ImageOps.exif_transpose(Image.open(f))
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    widths = sorted({min(width, source.width) for width in THUMBNAIL_WIDTHS.values()})
+    thumbnails = {}
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source.resize((width, height), Image.LANCZOS) if width != source.width else source
+        for fmt, (pil_format, extension, options) in THUMBNAIL_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            if shared:
+                name = storage.write(
+                    storage.thumbnail_name(source_name, width, extension), ContentFile(buffer.getvalue())
+                )
+            else:
+                name = default_storage.save(
+                    f'{THUMBNAIL_DIR}/{stem}_{width}w.{extension}', ContentFile(buffer.getvalue())
+                )
+            thumbnails.setdefault(fmt, {})[str(width)] = name
+
+    return record_thumbnails(property_image, thumbnails)
+
+
+def record_thumbnails(property_image, thumbnails):
+    from .caching import invalidate_property
+    from .models import PropertyImage
+
+    # update() skips the post_save signal, so invalidate explicitly
+    PropertyImage.objects.filter(pk=property_image.pk).update(thumbnails=thumbnails)
+    invalidate_property(property_image.property_id)
+    return thumbnails
+
+
+def thumbnail_storage(image):
+    """Storage holding the thumbnails of `image` (an image field's file)"""
+    storage = image.storage
+    if isinstance(storage, ContentAddressedStorage) and storage.is_blob(image.name):
+        return storage
+    return default_storage
+
+
+def thumbnail_url(storage, name, request=None):
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def build_srcset(image, thumbnails, request=None):
+    """{'webp': 'url 400w, url 800w', ...} for <picture>/<img srcset>"""
+    storage = thumbnail_storage(image)
+    return {
+        fmt: ', '.join(
+            f'{thumbnail_url(storage, name, request)} {width}w'
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+        for fmt, sizes in (thumbnails or {}).items()
+    }
+
+
+def pick_thumbnail(thumbnails, width, fmt='webp'):
+    """Stored name of the smallest `fmt` thumbnail at least `width` wide"""
+    sizes = (thumbnails or {}).get(fmt)
+    if not sizes:
+        return None
+    ordered = sorted(sizes.items(), key=lambda item: int(item[0]))
+    for size, name in ordered:
+        if int(size) >= width:
+            return name
+    return ordered[-1][1]
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import PropertyImage, Upload
+
+# Read the request body in pieces this size, so a chunk is never held whole
+READ_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif')
+MAX_ATTACH = 50
+
+
+class UploadError(ValueError):
+    """Raised for upload requests that can't be applied; carries the HTTP status"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def max_upload_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 30 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+
+
+def temp_dir():
+    directory = getattr(settings, 'UPLOAD_TEMP_DIR', None) or os.path.join(tempfile.gettempdir(), 'property-uploads')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def temp_path(upload_id):
+    return os.path.join(temp_dir(), f'{upload_id}.part')
+
+
+def remove_temp_file(upload_id):
+    try:
+        os.remove(temp_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def create_upload(user_id, filename, size):
+    filename = os.path.basename(str(filename or '')).strip()
+    if not filename:
+        raise UploadError('filename is required')
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise UploadError(f'Only {", ".join(ALLOWED_EXTENSIONS)} files can be uploaded')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be an integer')
+    if size < 1:
+        raise UploadError('size must be positive')
+    if size > max_upload_size():
+        raise UploadError(f'Uploads are limited to {max_upload_size()} bytes', status_code=413)
+
+    upload = Upload.objects.create(user_id=user_id, filename=filename[:255], size=size)
+    open(temp_path(upload.pk), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Write `length` bytes from `stream` at `offset`. The body is first read
+    into a scratch file with no lock held, so a slow client doesn't block
+    anyone; the offset then moves with a compare-and-set and the bytes are
+    copied into place under that row lock. Of two clients resuming the same
+    upload from the same offset, only the first gets to append. If the client
+    disconnects mid-chunk, whatever arrived is kept and the offset says where
+    to resume.
+    """
+    if length > max_chunk_size():
+        raise UploadError(f'Chunks are limited to {max_chunk_size()} bytes', status_code=413)
+    if offset != upload.offset:
+        raise UploadError(f'Upload-Offset must be {upload.offset}', status_code=409)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared size', status_code=413)
+
+    with tempfile.TemporaryFile(dir=temp_dir()) as chunk:
+        written = 0
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            written += len(data)
+
+        with transaction.atomic():
+            moved = Upload.objects.filter(pk=upload.pk, offset=offset).update(
+                offset=offset + written, updated_at=timezone.now()
+            )
+            if not moved:
+                current = Upload.objects.filter(pk=upload.pk).values_list('offset', flat=True).first()
+                if current is None:
+                    raise UploadError('Upload no longer exists', status_code=404)
+                raise UploadError(f'Upload-Offset must be {current}', status_code=409)
+            chunk.seek(0)
+            with open(temp_path(upload.pk), 'r+b') as f:
+                # Drop anything past the recorded offset left by an interrupted write
+                f.seek(offset)
+                f.truncate()
+                shutil.copyfileobj(chunk, f, READ_SIZE)
+
+    upload.offset = offset + written
+    return upload
+
+
+def attach_uploads(property, uploads, cover=None):
+    """
+    Turn finished uploads into PropertyImage rows. Each file is checked to be
+    an image, then copied into storage in chunks; the temporary file and the
+    upload row go away once the transaction commits.
+    """
+    for upload in uploads:
+        if not upload.complete:
+            raise UploadError(f'Upload {upload.pk} is not complete')
+        try:
+            with Image.open(temp_path(upload.pk)) as image:
+                image.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise UploadError(f'Upload {upload.pk} is not a valid image')
+
+    images = []
+    with transaction.atomic():
+        if cover is not None:
+            property.images.update(is_cover=False)
+        for upload in uploads:
+            with open(temp_path(upload.pk), 'rb') as f:
+                images.append(PropertyImage.objects.create(
+                    property=property,
+                    image=File(f, name=upload.filename),
+                    is_cover=upload.pk == cover,
+                ))
+            upload_id = upload.pk
+            transaction.on_commit(lambda upload_id=upload_id: remove_temp_file(upload_id))
+        Upload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    return images
@@ -1,9 +1,22 @@
 from django.urls import path  
-from .views import get_properties, property_detail, register_user, login_user
+from .async_views import alogin_user, aproperties, aproperty_detail
+from .views import (
+    market_stats, metrics, property_batch, property_clusters, property_facets, property_images, refresh_token,
+    register_user, start_upload, upload_detail,
+)
 
 urlpatterns = [  
-    path('properties/', get_properties),
-    path('properties/<int:pk>/', property_detail),
+    path('properties/', aproperties),
+    path('properties/clusters/', property_clusters),
+    path('properties/facets/', property_facets),
+    path('properties/batch/', property_batch),
+    path('properties/<int:pk>/', aproperty_detail),
+    path('properties/<int:pk>/images/', property_images),
+    path('market-stats/', market_stats),
+    path('uploads/', start_upload),
+    path('uploads/<uuid:upload_id>/', upload_detail),
     path('register/', register_user),
-    path('login/', login_user),
+    path('login/', alogin_user),
+    path('token/refresh/', refresh_token),
+    path('_metrics', metrics),
 ]
\ No newline at end of file
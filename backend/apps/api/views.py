@@ -1,60 +1,349 @@
-from rest_framework.decorators import api_view  
-from rest_framework.response import Response  
-from rest_framework import status
-from .models import Property, PropertyImage
-from apps.users.models import User
-from .serializer import PropertySerializer, PropertyImageSerializer, UserSerializer
+import hmac
+import logging
+import uuid
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse
+from django.views.static import serve
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
 
-@api_view(['GET', 'POST'])
-def get_properties(request):  
-    if request.method == 'GET':
-        # Check if user filter is provided
-        user_id = request.query_params.get('user', None)
-        
-        # Filter properties by user if user_id is provided
-        if user_id:
-            properties = Property.objects.filter(user_id=user_id)
-        else:
-            properties = Property.objects.all()
-            
-        serializer = PropertySerializer(properties, many=True, context={'request': request})  
-        return Response(serializer.data)
-    elif request.method == 'POST':
-        print("POST data:", request.data)
+from apps.users.models import User
+from apps.users.tokens import TokenError, issue_tokens, verify_refresh_token
+from .batch import BatchError, apply_operations, parse_operations, validate_operations
+from .caching import cached_response, invalidate_property, make_entry
+from .clusters import MAX_ZOOM, get_clusters
+from .facets import get_facets
+from .filters import FilterError, filter_properties, parse_bbox
+from .metrics import registry
+from .models import ArchivedProperty, ArchivedPropertyImage, MarketStat, Property, PropertyImage, Upload
+from .serializer import (
+    ArchivedPropertySerializer, MarketStatSerializer, PropertySerializer, PropertyCardSerializer, PropertyImageSerializer,
+    UploadSerializer, UserSerializer,
+)
+from .uploads import MAX_ATTACH, UploadError, append_chunk, attach_uploads, create_upload, remove_temp_file
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Unique constraints on users_user that registration reports by field
+EMAIL_CONSTRAINT = 'users_user_email_ci_uniq'
+USERNAME_CONSTRAINT = 'users_user_username_key'
+
+
+def property_queryset():
+    """Properties with their owner and images loaded in a fixed number of queries"""
+    images = PropertyImage.objects.order_by(*PropertyImage._meta.ordering)
+    return Property.objects.defer('search_vector').select_related('user', 'cover_image').prefetch_related(
+        Prefetch('images', queryset=images)
+    )
+
+
+def property_card_queryset():
+    """
+    Only the columns a listing card needs. The cover is the denormalized
+    `cover_image`, joined by primary key, so the images aren't scanned.
+    """
+    columns = [f for f in PropertyCardSerializer.Meta.fields if f not in ('cover_image', 'distance_km')]
+    return Property.objects.select_related('cover_image').only(
+        *columns, 'cover_image__image', 'cover_image__thumbnails'
+    )
+
+def archived_property_queryset():
+    """Archived properties, loaded like `property_queryset`"""
+    images = ArchivedPropertyImage.objects.order_by(*ArchivedPropertyImage._meta.ordering)
+    return ArchivedProperty.objects.select_related('user').prefetch_related(Prefetch('images', queryset=images))
+
+
+def archived_detail_response(request, cache_key, pk):
+    """Detail of the archived property `pk`, or a 404 if there isn't one"""
+    try:
+        archived = archived_property_queryset().get(pk=pk)
+    except ArchivedProperty.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    data = ArchivedPropertySerializer(archived, context={'request': request}).data
+    return cached_response(request, make_entry(cache_key, data, archived.updated_at))
+
+def is_duplicate_external_ref(error):
+    constraint = getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None) or str(error)
+    return 'property_user_external_ref_uniq' in constraint
+
+
+def save_property(serializer):
+    """
+    Save a validated PropertySerializer. A concurrent write can still take
+    the external_ref after validation; that is reported like the validator
+    would, as a 400. Returns an error response or None.
+    """
+    try:
+        with transaction.atomic():
+            serializer.save()
+    except IntegrityError as e:
+        if not is_duplicate_external_ref(e):
+            raise
+        return Response(
+            {'external_ref': ['You already have a property with this external_ref.']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def create_property(request):
+    """Create a property; GET of the list is served by `async_views.aproperties`"""
+    if request.method == 'POST':
+        logger.debug('Create property payload: %s', request.data)
         serializer = PropertySerializer(data=request.data, context={'request': request})  
         if serializer.is_valid():  
-            serializer.save()  
+            error = save_property(serializer)
+            if error is not None:
+                return error
             return Response(serializer.data, status=status.HTTP_201_CREATED)  
-        print("Validation errors:", serializer.errors)
+        logger.info('Create property rejected: %s', serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET', 'PUT', 'DELETE'])
+@api_view(['GET'])
+def property_clusters(request):
+    """Map clusters (count, centroid, price range) for a bounding box and zoom level"""
+    try:
+        bbox = parse_bbox(request.query_params.get('bbox', ''))
+    except ValueError:
+        return Response(
+            {'error': 'bbox must be min_lng,min_lat,max_lng,max_lat'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        zoom = int(request.query_params.get('zoom', ''))
+    except ValueError:
+        zoom = -1
+    if not 0 <= zoom <= MAX_ZOOM:
+        return Response(
+            {'error': f'zoom must be an integer between 0 and {MAX_ZOOM}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # The same filters as the listing, except the viewport which is tiled instead
+    params = request.query_params.copy()
+    params.pop('bbox', None)
+    try:
+        properties = filter_properties(Property.objects.all(), params)
+        clusters = get_clusters(properties, params, zoom, bbox)
+    except (FilterError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'zoom': zoom, 'clusters': clusters})
+
+@api_view(['GET'])
+def property_facets(request):
+    """
+    Listing counts per city, type, status, furnished, price bucket and
+    bedroom bucket for the current filters, for the filter sidebar
+    """
+    try:
+        facets = get_facets(Property.objects.all(), request.query_params)
+    except FilterError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(facets)
+
+@api_view(['GET'])
+def market_stats(request):
+    """
+    Precomputed price statistics per city, property type and status,
+    optionally narrowed with ?city=, ?property_type= and ?status=
+    """
+    stats = MarketStat.objects.all()
+    choices = {'property_type': Property.PROPERTY_TYPE_CHOICES, 'status': Property.STATUS_CHOICES}
+    for param in ('city', 'property_type', 'status'):
+        value = request.query_params.get(param, '').strip()
+        if not value:
+            continue
+        if param in choices and value not in dict(choices[param]):
+            return Response({'error': f'Invalid {param}: {value}'}, status=status.HTTP_400_BAD_REQUEST)
+        stats = stats.filter(**{param: value})
+    return Response(MarketStatSerializer(stats, many=True).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def property_batch(request):
+    """
+    Apply a list of create/update/delete operations in one transaction.
+    Invalid items are reported and skipped unless `atomic` is true, in which
+    case any invalid item rejects the whole batch.
+    """
+    try:
+        operations = parse_operations(request.data)
+    except BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    creates, updates, deletes, rejected = validate_operations(operations, request)
+    if rejected and request.data.get('atomic'):
+        return Response({'results': rejected}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        results = apply_operations(creates, updates, deletes) + rejected
+    except IntegrityError as e:
+        # Only reachable when a concurrent write took an external_ref after validation
+        if not is_duplicate_external_ref(e):
+            raise
+        return Response(
+            {'error': 'An external_ref in this batch was taken by a concurrent write; nothing was applied'},
+            status=status.HTTP_409_CONFLICT
+        )
+    results.sort(key=lambda item: item['index'])
+    return Response(
+        {'results': results},
+        status=status.HTTP_207_MULTI_STATUS if rejected else status.HTTP_200_OK
+    )
+
+@api_view(['PUT', 'DELETE'])
+@permission_classes([IsAuthenticatedOrReadOnly])
 def property_detail(request, pk):
+    """Update or delete a property; GET is served by `async_views.aproperty_detail`"""
     try:
-        property = Property.objects.get(pk=pk)
+        property = property_queryset().get(pk=pk)
     except Property.DoesNotExist:
+        # Archived listings are read-only
         return Response(status=status.HTTP_404_NOT_FOUND)
-        
-    if request.method == 'GET':
-        serializer = PropertySerializer(property, context={'request': request})
-        return Response(serializer.data)
-        
-    elif request.method == 'PUT':
-        print("PUT data:", request.data)
+    
+    # Writes are limited to the owner (or staff); the token carries both facts
+    if not (request.user.is_staff or property.user_id == request.user.pk):
+        return Response(
+            {'error': 'You do not have permission to modify this property'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    if request.method == 'PUT':
+        logger.debug('Update property %s payload: %s', pk, request.data)
         serializer = PropertySerializer(property, data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            error = save_property(serializer)
+            if error is not None:
+                return error
+            # New uploads are not in the prefetched images, so drop the cache
+            property._prefetched_objects_cache = {}
             return Response(serializer.data)
-        print("Validation errors:", serializer.errors)
+        logger.info('Update property %s rejected: %s', pk, serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
+    if request.method == 'DELETE':
+        # Soft delete; `manage.py archive_properties` purges the row later
+        property.soft_delete()
+        invalidate_property(property.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response(UploadSerializer(upload).data, status=status_code)
+    response['Upload-Offset'] = str(upload.offset)
+    response['Upload-Length'] = str(upload.size)
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_upload(request):
+    """
+    Start a resumable image upload: {"filename", "size"}. The file is then
+    sent with PATCH requests to the returned upload and attached to a
+    property with POST /api/properties/<id>/images/.
+    """
+    try:
+        upload = create_upload(request.user.pk, request.data.get('filename'), request.data.get('size'))
+    except UploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    response = upload_response(upload, status.HTTP_201_CREATED)
+    response['Location'] = request.build_absolute_uri(f'/api/uploads/{upload.pk}/')
+    return response
+
+@api_view(['GET', 'HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_detail(request, upload_id):
+    """
+    GET/HEAD reports how many bytes have arrived (to resume from), PATCH
+    appends the raw request body at the `Upload-Offset` header, DELETE aborts.
+    """
+    try:
+        upload = Upload.objects.get(pk=upload_id, user_id=request.user.pk)
+    except Upload.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method in ('GET', 'HEAD'):
+        return upload_response(upload)
+    
+    elif request.method == 'PATCH':
+        if request.content_type != 'application/offset+octet-stream':
+            return Response(
+                {'error': 'Chunks must be sent as application/offset+octet-stream'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response(
+                {'error': 'Upload-Offset and Content-Length headers are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            # The body is streamed from the request, never parsed into memory
+            upload = append_chunk(upload, offset, request.stream, length) if length else upload
+        except UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        return upload_response(upload)
+    
     elif request.method == 'DELETE':
-        property.delete()
+        upload.delete()
+        transaction.on_commit(lambda: remove_temp_file(upload_id))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 @api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def property_images(request, pk):
+    """Attach finished uploads to a property: {"uploads": [ids], "cover": id}"""
+    try:
+        property = Property.objects.get(pk=pk)
+    except Property.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if not (request.user.is_staff or property.user_id == request.user.pk):
+        return Response(
+            {'error': 'You do not have permission to modify this property'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    ids = request.data.get('uploads')
+    if not isinstance(ids, list) or not ids or len(ids) > MAX_ATTACH:
+        return Response(
+            {'error': f'uploads must be a list of 1 to {MAX_ATTACH} upload ids'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        ids = list(dict.fromkeys(uuid.UUID(str(value)) for value in ids))
+        cover = request.data.get('cover')
+        cover = uuid.UUID(str(cover)) if cover else None
+    except ValueError:
+        return Response({'error': 'Upload ids must be UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
+    if cover is not None and cover not in ids:
+        return Response({'error': 'cover must be one of the uploads'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    uploads = Upload.objects.in_bulk(ids)
+    missing = [str(pk) for pk in ids if pk not in uploads or uploads[pk].user_id != request.user.pk]
+    if missing:
+        return Response({'error': f'Unknown uploads: {", ".join(missing)}'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        images = attach_uploads(property, [uploads[pk] for pk in ids], cover=cover)
+    except UploadError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    serializer = PropertyImageSerializer(images, many=True, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@authentication_classes([])
 def register_user(request):
     """Register a new user"""
     if request.method == 'POST':
@@ -71,37 +360,37 @@ def register_user(request):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            # Check if username or email already exists
-            if User.objects.filter(username=data['username']).exists():
-                return Response(
-                    {'error': 'Username already exists'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if User.objects.filter(email=data['email']).exists():
+            # A single INSERT; the unique constraints on username and
+            # UPPER(email) reject duplicates without a check-then-create race
+            try:
+                with transaction.atomic():
+                    user = User.objects.create_user(
+                        username=data['username'],
+                        email=data['email'],
+                        password=data['password'],  # create_user will hash the password automatically
+                        first_name=data.get('first_name', ''),
+                        last_name=data.get('last_name', ''),
+                        phone=data.get('phone', ''),
+                        is_active=True
+                    )
+            except IntegrityError as e:
+                constraint = getattr(getattr(e.__cause__, 'diag', None), 'constraint_name', None) or str(e)
+                if EMAIL_CONSTRAINT in constraint:
+                    field = 'Email'
+                elif USERNAME_CONSTRAINT in constraint:
+                    field = 'Username'
+                else:
+                    raise
                 return Response(
-                    {'error': 'Email already exists'}, 
+                    {'error': f'{field} already exists'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Create new user with create_user method to ensure proper setup
-            user = User.objects.create_user(
-                username=data['username'],
-                email=data['email'],
-                password=data['password'],  # create_user will hash the password automatically
-                first_name=data.get('first_name', ''),
-                last_name=data.get('last_name', ''),
-                phone=data.get('phone', '')
-            )
-            
-            # Ensure the user is active and saved
-            user.is_active = True
-            user.save()
-            
             # Return user data (excluding password)
             serializer = UserSerializer(user)
             return Response({
                 'user': serializer.data,
+                **issue_tokens(user),
                 'message': 'User registered successfully'
             }, status=status.HTTP_201_CREATED)
             
@@ -111,61 +400,44 @@ def register_user(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         except Exception as e:
-            print(f"Error creating user: {e}")
+            logger.exception('Error creating user')
             return Response(
                 {'error': f'Registration failed: {str(e)}'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
 @api_view(['POST'])
-def login_user(request):
-    """Login a user"""
-    if request.method == 'POST':
-        try:
-            data = request.data
-            username = data.get('username')
-            password = data.get('password')
-            
-            if not username or not password:
-                return Response(
-                    {'error': 'Username and password are required'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get the user model and authenticate
-            User = get_user_model()
-            
-            # Try to authenticate by username
-            from django.contrib.auth import authenticate
-            user = authenticate(username=username, password=password)
-            
-            # If authentication by username fails, try by email
-            if user is None:
-                try:
-                    # Find user by email
-                    email_user = User.objects.get(email=username)
-                    # Try to authenticate with found username
-                    user = authenticate(username=email_user.username, password=password)
-                except User.DoesNotExist:
-                    pass
-            
-            if user is not None:
-                # Authentication successful
-                serializer = UserSerializer(user)
-                return Response({
-                    'user': serializer.data,
-                    'message': 'Login successful'
-                })
-            else:
-                # Authentication failed
-                return Response(
-                    {'error': 'Invalid credentials'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-                
-        except Exception as e:
-            print(f"Error logging in: {e}")
-            return Response(
-                {'error': f'Login failed: {str(e)}'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+@authentication_classes([])
+def refresh_token(request):
+    """Exchange a refresh token for a new access/refresh pair"""
+    try:
+        claims = verify_refresh_token(request.data.get('refresh') or '')
+    except TokenError as e:
+        return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    # The only lookup in the token flow: stop refreshing for disabled accounts
+    user = get_user_model().objects.filter(pk=claims['uid'], is_active=True).first()
+    if user is None:
+        return Response({'error': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response(issue_tokens(user))
+
+
+def metrics(request):
+    """Prometheus text exposition of the request metrics, for scrapers holding METRICS_TOKEN"""
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not token or len(header) != 2 or header[0].lower() != 'bearer':
+        raise Http404
+    if not hmac.compare_digest(header[1].encode(), token.encode()):
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def serve_immutable(request, path, document_root=None):
+    """
+    Serve a content-addressed image file. Its name is the hash of its bytes,
+    so browsers and CDNs may keep it for a year without revalidating.
+    """
+    response = serve(request, path, document_root=document_root)
+    response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
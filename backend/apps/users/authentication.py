@@ -0,0 +1,44 @@
+from rest_framework import authentication, exceptions
+
+from .tokens import TokenError, verify_access_token
+
+
+class TokenUser:
+    """
+    The caller as described by the access token claims. Stands in for
+    `User` on API requests so that authenticating never queries the database.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_superuser = False
+
+    def __init__(self, claims):
+        self.id = self.pk = claims['uid']
+        self.username = claims.get('username', '')
+        self.is_staff = claims.get('staff', False)
+        self.role = claims.get('role', 'user')
+
+    def __str__(self):
+        return self.username
+
+
+class TokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate `Authorization: Bearer <token>` headers issued by login/register"""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header')
+
+        try:
+            claims = verify_access_token(header[1].decode())
+        except (TokenError, UnicodeError) as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+UserModel = get_user_model()
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Authenticate with either the username or the email address. The account
+    is resolved in one indexed query and the password is hashed exactly once
+    per attempt, including for unknown accounts so they cost the same.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        candidates = list(
+            UserModel._default_manager.filter(
+                Q(username=username) | (Q(email__iexact=username) & ~Q(email=''))
+            )[:2]
+        )
+        if not candidates:
+            # Run the hasher anyway so unknown accounts cannot be told apart by timing
+            UserModel().set_password(password)
+            return None
+
+        # A username that happens to equal someone else's email wins
+        user = next((u for u in candidates if u.username == username), candidates[0])
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Refuse to add the constraint over emails that differ only in case;
+    which account keeps the address is for an admin to decide.
+    """
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias).exclude(email='')
+        .annotate(normalized=Upper('email')).values('normalized')
+        .annotate(accounts=models.Count('pk')).filter(accounts__gt=1)
+        .values_list('normalized', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Several accounts share these emails (ignoring case): {}. Change or '
+            'clear the email of all but one account each, then migrate again.'.format(', '.join(duplicates))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('email'), condition=models.Q(('email', ''), _negated=True), name='users_user_email_ci_uniq'),
+        ),
+    ]
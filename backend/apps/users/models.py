@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Upper
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -23,6 +24,16 @@ class User(AbstractUser):
     
     class Meta:
         ordering = ['-date_joined']
+        constraints = [
+            # One account per email regardless of case; also serves the
+            # case-insensitive email lookup used at login. Accounts created
+            # without an email (e.g. createsuperuser) are left out.
+            models.UniqueConstraint(
+                Upper('email'),
+                condition=~models.Q(email=''),
+                name='users_user_email_ci_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()}"
\ No newline at end of file
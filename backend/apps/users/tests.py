@@ -1,3 +1,97 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import User
+
+
+class UsernameOrEmailBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='amina', email='Amina@Example.com', password='secret')
+
+    def test_login_by_username_or_email(self):
+        self.assertEqual(authenticate(username='amina', password='secret'), self.user)
+        self.assertEqual(authenticate(username='amina@example.com', password='secret'), self.user)
+        self.assertIsNone(authenticate(username='amina', password='wrong'))
+
+    def test_failed_email_login_is_one_query(self):
+        with CaptureQueriesContext(connection) as context:
+            self.assertIsNone(authenticate(username='amina@example.com', password='wrong'))
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_username_match_beats_email_match(self):
+        other = User.objects.create_user(username='amina@example.com', password='other')
+        self.assertEqual(authenticate(username='amina@example.com', password='other'), other)
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        User.objects.create_user(username='amina', password='secret')
+
+    def test_account_is_throttled_after_repeated_attempts(self):
+        for _ in range(10):
+            response = self.client.post('/api/login/', {'username': 'amina', 'password': 'bad'}, format='json')
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/login/', {'username': 'AMINA', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def register(self, username, email):
+        return self.client.post('/api/register/', {
+            'username': username, 'email': email, 'password': 'secret-pass-123',
+        }, format='json')
+
+    def test_register_is_one_insert(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.register('amina', 'amina@example.com')
+        self.assertEqual(response.status_code, 201)
+        statements = [q['sql'] for q in context.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+
+    def test_duplicates_map_to_the_same_messages(self):
+        self.register('amina', 'amina@example.com')
+        self.assertEqual(self.register('amina', 'other@example.com').data['error'], 'Username already exists')
+        self.assertEqual(self.register('other', 'AMINA@example.com').data['error'], 'Email already exists')
+
+
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """Load test: many simultaneous signups racing for the same email"""
+    signups = 16
+
+    def test_concurrent_signups_create_one_account(self):
+        barrier = threading.Barrier(self.signups)
+        statuses = []
+
+        def signup(i):
+            try:
+                barrier.wait()
+                response = APIClient().post('/api/register/', {
+                    'username': f'user{i}',
+                    'email': 'Same@Example.com' if i % 2 else 'same@example.com',
+                    'password': 'secret-pass-123',
+                }, format='json')
+                statuses.append((response.status_code, response.data.get('error')))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=signup, args=(i,)) for i in range(self.signups)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(User.objects.filter(email__iexact='same@example.com').count(), 1)
+        self.assertEqual(sum(1 for code, _ in statuses if code == 201), 1)
+        self.assertTrue(all(error == 'Email already exists' for code, error in statuses if code != 201))
@@ -0,0 +1,20 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Limit login attempts per client address"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(SimpleRateThrottle):
+    """Limit login attempts per targeted account, whatever address they come from"""
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': str(username).strip().lower()}
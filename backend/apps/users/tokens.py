@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+
+ACCESS_TOKEN_SALT = 'apps.users.tokens.access'
+REFRESH_TOKEN_SALT = 'apps.users.tokens.refresh'
+
+
+class TokenError(Exception):
+    """Raised when a token is malformed, tampered with or expired"""
+
+
+def access_token_lifetime():
+    return getattr(settings, 'ACCESS_TOKEN_LIFETIME', timedelta(minutes=15))
+
+
+def refresh_token_lifetime():
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', timedelta(days=7))
+
+
+def issue_tokens(user):
+    """
+    Signed, timestamped tokens in the spirit of JWT. The access token carries
+    everything the API needs to identify the caller, so verifying it needs no
+    database or session lookup; the refresh token only carries the user id.
+    """
+    claims = {
+        'uid': user.pk,
+        'username': user.username,
+        'staff': user.is_staff,
+        'role': user.role,
+    }
+    return {
+        'token': signing.dumps(claims, salt=ACCESS_TOKEN_SALT, compress=True),
+        'refresh': signing.dumps({'uid': user.pk}, salt=REFRESH_TOKEN_SALT),
+        'expires_in': int(access_token_lifetime().total_seconds()),
+    }
+
+
+def load_token(token, salt, max_age):
+    try:
+        return signing.loads(token, salt=salt, max_age=max_age)
+    except signing.SignatureExpired:
+        raise TokenError('Token has expired')
+    except signing.BadSignature:
+        raise TokenError('Invalid token')
+
+
+def verify_access_token(token):
+    return load_token(token, ACCESS_TOKEN_SALT, access_token_lifetime())
+
+
+def verify_refresh_token(token):
+    return load_token(token, REFRESH_TOKEN_SALT, refresh_token_lifetime())
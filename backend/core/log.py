@@ -0,0 +1,135 @@
+"""
+Logging plumbing for the project.
+
+Records are filtered and sampled in the request thread, then handed to a
+bounded queue; a background QueueListener does the formatting and the
+writing, so a slow stdout never blocks a worker. Request payloads logged as
+arguments or `extra` fields are redacted before they leave the thread.
+"""
+import json
+import logging
+import queue
+import random
+import re
+import sys
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+from django.core.files import File
+from django.http import QueryDict
+
+REDACTED = '[REDACTED]'
+SENSITIVE_KEY = re.compile(r'pass(word|wd)?|secret|token|refresh|authorization|api[_-]?key|cookie|session', re.I)
+MAX_STRING_LENGTH = 500
+MAX_DEPTH = 5
+
+# Attributes every LogRecord has; anything else came in through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact(value, depth=0):
+    """
+    Copy `value` into plain data that is safe to log: secrets are masked,
+    uploaded files become a short description and long strings are cut.
+    """
+    if depth > MAX_DEPTH:
+        return '...'
+    if isinstance(value, File):
+        return f'<file {getattr(value, "name", "")!r} {getattr(value, "size", "?")} bytes>'
+    if isinstance(value, QueryDict):
+        value = {key: values[0] if len(values) == 1 else values for key, values in value.lists()}
+    if isinstance(value, Mapping):
+        return {
+            key: REDACTED if SENSITIVE_KEY.search(str(key)) else redact(item, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        return [redact(item, depth + 1) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str) and len(value) > MAX_STRING_LENGTH:
+        return f'{value[:MAX_STRING_LENGTH]}... ({len(value)} chars)'
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of records below WARNING for the configured logger
+    names, e.g. {'apps.api.performance': 0.1}. The longest matching prefix
+    wins; loggers without a rate are not sampled.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(f'{name}.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra` fields as top-level keys"""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES})
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class QueueingHandler(QueueHandler):
+    """
+    Enqueue records for a background listener that writes them to `stream`.
+    The queue is bounded and never blocks: when it is full the record is
+    dropped and counted in `dropped`.
+    """
+
+    def __init__(self, stream=None, queue_size=10000, formatter=None):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(formatter or JsonFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.listener.start()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Unlike the stock QueueHandler, leave the message unformatted so the
+        # listener thread does that work; only snapshot and redact the data
+        record = logging.makeLogRecord(vars(record))
+        if isinstance(record.args, Mapping):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        for key, value in list(vars(record).items()):
+            if key not in RECORD_ATTRIBUTES:
+                setattr(record, key, redact(value))
+        if record.exc_info:
+            # Tracebacks hold frames alive; render them now and drop the objects
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # Called by logging.shutdown() at exit: drain the queue first
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
@@ -11,7 +11,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 from dotenv import load_dotenv
 import os
+import sys
 from pathlib import Path
+from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 load_dotenv()  # Load .env file
 
@@ -44,9 +47,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware too
+    'apps.api.middleware.PerformanceMiddleware',
+    'apps.api.replicas.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,8 +64,78 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Django REST Framework
+# API clients authenticate with signed bearer tokens instead of sessions
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'apps.users.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_account': '10/min',
+    },
+}
+
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=15)
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+
+# Performance instrumentation
+# Requests issuing more queries than this are logged as warnings;
+# /api/_metrics is off unless METRICS_TOKEN is set, and then only answers
+# requests sending it as `Authorization: Bearer <token>`
+
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '20'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Logging
+# Application records go through a bounded queue to a background thread that
+# writes JSON lines; payloads are redacted (see core/log.py). Per-request
+# performance records are sampled. Test runs only show warnings and errors.
+
+TESTING = sys.argv[1:2] == ['test']
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING' if TESTING else 'INFO')
+LOG_SAMPLE_RATES = {
+    'apps.api.performance': float(os.getenv('PERFORMANCE_LOG_SAMPLE_RATE', '0.1')),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': 'core.log.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'core.log.QueueingHandler',
+            'filters': ['sampling'],
+        },
+    },
+    'loggers': {
+        'apps': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # CORS (Allow Vite on port 5173)
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS').split(',')
+# Resumable uploads send and read the offset in headers
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset')
+CORS_EXPOSE_HEADERS = ['Location', 'Upload-Offset', 'Upload-Length']
+
+# Resumable image uploads (see apps/api/uploads.py)
+# Chunks are appended to files in UPLOAD_TEMP_DIR (the system temp directory
+# by default) until attached to a property
+
+UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR')
+UPLOAD_MAX_SIZE = 30 * 1024 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
 
 ROOT_URLCONF = 'core.urls'
 
@@ -94,6 +171,39 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated hosts in DB_REPLICA_HOSTS become the aliases
+# replica1, replica2, ... with the primary's credentials. Safe reads go to
+# them (apps/api/replicas.py); pointing one at the primary's own host is
+# enough to exercise the routing locally.
+DATABASE_REPLICAS = []
+for i, host in enumerate(h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+    DATABASES[f'replica{i + 1}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{i + 1}')
+
+DATABASE_ROUTERS = ['apps.api.replicas.ReplicaRouter']
+# Requests from whoever wrote within this many seconds read from the primary
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+# Replicas further behind than this are skipped; lag is checked this often
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', 5))
+
+# Cache
+# Redis in production (set REDIS_URL), per-process memory otherwise
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -135,9 +245,28 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Property photos are stored once per distinct content under a hash name
+# (apps/api/storage.py); those URLs never change content and are cached forever
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'images': {'BACKEND': 'apps.api.storage.ContentAddressedStorage'},
+}
+# Unreferenced image files younger than this are left for the next collection
+IMAGE_BLOB_GRACE_SECONDS = int(os.getenv('IMAGE_BLOB_GRACE_SECONDS', 3600))
+
+# `manage.py archive_properties`: sold, rented and inactive listings untouched
+# this long move to the archive; deleted listings are purged after the retention
+PROPERTY_ARCHIVE_AFTER_DAYS = int(os.getenv('PROPERTY_ARCHIVE_AFTER_DAYS', 180))
+PROPERTY_DELETED_RETENTION_DAYS = int(os.getenv('PROPERTY_DELETED_RETENTION_DAYS', 30))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'users.User'
+
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.UsernameOrEmailBackend',
+]
\ No newline at end of file
@@ -15,15 +15,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import os
+
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from apps.api.storage import BLOB_DIR
+from apps.api.views import serve_immutable
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('apps.api.urls')),
 ]
 
-# Serve media files in development
+# Serve media files in development. Content-addressed images get far-future
+# cache headers; in production the web server should send the same for
+# MEDIA_URL + BLOB_DIR
 if settings.DEBUG:
+    urlpatterns += [
+        re_path(
+            rf'^{settings.MEDIA_URL.lstrip("/")}{BLOB_DIR}/(?P<path>.*)$', serve_immutable,
+            {'document_root': os.path.join(settings.MEDIA_ROOT, BLOB_DIR)},
+        ),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import PropertyForm from './PropertyForm';
+import { authHeaders, propertyService } from '../../services/api';
 import './styles/PropertyStyles.css';
 
 function PropertyCRUD({ showFormDirectly = false }) {
@@ -19,12 +20,7 @@ function PropertyCRUD({ showFormDirectly = false }) {
   const fetchProperties = async () => {
     setLoading(true);
     try {
-      const response = await fetch('http://127.0.0.1:8000/api/properties/');
-      if (!response.ok) {
-        throw new Error('Failed to fetch properties');
-      }
-      const data = await response.json();
-      setProperties(data);
+      setProperties(await propertyService.getAllProperties());
     } catch (error) {
       console.error('Error fetching properties:', error);
       setError('Failed to load properties. Please try again later.');
@@ -74,8 +70,7 @@ function PropertyCRUD({ showFormDirectly = false }) {
     try {
       const response = await fetch(`http://127.0.0.1:8000/api/properties/${id}/`, {
         method: 'DELETE',
-        // Include credentials if you're using session authentication
-        // credentials: 'include',
+        headers: authHeaders(),
       });
       
       if (!response.ok) {
@@ -106,6 +101,10 @@ function PropertyCRUD({ showFormDirectly = false }) {
 
   // Get cover image or placeholder
   const getCoverImage = (property) => {
+    // The API sends the cover (or its card thumbnail) with every listing
+    if (property.cover_image) {
+      return property.cover_image;
+    }
     if (property.images && property.images.length > 0) {
       // Find cover image or use first image
       const coverImage = property.images.find(img => img.is_cover) || property.images[0];
@@ -53,7 +53,9 @@ const PropertyCard = ({ property }) => {
     <div className="property-card">
       <div className="property-card-header">
         <div className="property-image">
-          {property.images && property.images.length > 0 ? (
+          {property.cover_image ? (
+            <LazyCardImage src={property.cover_image} alt={property.title} />
+          ) : property.images && property.images.length > 0 ? (
             <LazyCardImage src={property.images[0].image} alt={property.title} />
           ) : (
             <div className="no-image">
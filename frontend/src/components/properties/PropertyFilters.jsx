@@ -7,9 +7,19 @@ import './styles/PropertyFilters.css';
  * @param {Function} onFilterChange - Function to handle filter changes
  * @param {Function} onApplyFilters - Function to handle search submission
  * @param {Function} onResetFilters - Function to clear all filters
+ * @param {Object} facets - Listing counts per option from /api/properties/facets/
  * @returns {JSX.Element} - A component with property filter controls
  */
-const PropertyFilters = ({ filters, onFilterChange, onApplyFilters, onResetFilters }) => {
+const PropertyFilters = ({ filters, facets, onFilterChange, onApplyFilters, onResetFilters }) => {
+  // Number of listings an option would show, or null while facets are unknown
+  const facetCount = (facet, value) => {
+    if (!facets || !value) return null;
+    const option = facets[facet].find((item) => item.value === value);
+    return option ? option.count : 0;
+  };
+
+  const withCount = (label, count) => (count === null ? label : `${label} (${count})`);
+
   // Property type options
   const propertyTypes = [
     { value: '', label: 'All Types' },
@@ -75,7 +85,7 @@ const PropertyFilters = ({ filters, onFilterChange, onApplyFilters, onResetFilte
             >
               {propertyTypes.map((type, index) => (
                 <option key={index} value={type.value}>
-                  {type.label}
+                  {withCount(type.label, facetCount('property_type', type.value))}
                 </option>
               ))}
             </select>
@@ -91,7 +101,7 @@ const PropertyFilters = ({ filters, onFilterChange, onApplyFilters, onResetFilte
             >
               {statusOptions.map((status, index) => (
                 <option key={index} value={status.value}>
-                  {status.label}
+                  {withCount(status.label, facetCount('status', status.value))}
                 </option>
               ))}
             </select>
@@ -179,7 +189,15 @@ const PropertyFilters = ({ filters, onFilterChange, onApplyFilters, onResetFilte
                 value={filters.city || ''}
                 onChange={onFilterChange}
                 placeholder="City"
+                list="city-options"
               />
+              <datalist id="city-options">
+                {(facets ? facets.city : []).map((city) => (
+                  <option key={city.value} value={city.value}>
+                    {withCount(city.value, city.count)}
+                  </option>
+                ))}
+              </datalist>
             </div>
           </div>
 
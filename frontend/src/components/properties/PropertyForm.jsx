@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import './styles/PropertyStyles.css';
+import { authHeaders, propertyService } from '../../services/api';
 
 function PropertyForm({ propertyToEdit, onFormSubmit, onCancel }) {
   // Initialize form state with default values or values from propertyToEdit
@@ -172,11 +173,6 @@ function PropertyForm({ propertyToEdit, onFormSubmit, onCancel }) {
         }
       });
       
-      // Add images to FormData
-      images.forEach((image, index) => {
-        formDataToSend.append(`uploaded_images[${index}]`, image);
-      });
-      
       // Add current user ID to the form data
       const loggedInUser = JSON.parse(localStorage.getItem('user'));
       if (loggedInUser && loggedInUser.id) {
@@ -200,6 +196,7 @@ function PropertyForm({ propertyToEdit, onFormSubmit, onCancel }) {
       const response = await fetch(url, {
         method,
         body: formDataToSend,
+        headers: authHeaders(),
         // Don't set Content-Type header, let the browser set it with the boundary
         // for multipart/form-data
       });
@@ -210,6 +207,11 @@ function PropertyForm({ propertyToEdit, onFormSubmit, onCancel }) {
       }
 
       const data = await response.json();
+
+      // Images go up separately, in resumable chunks, once the property exists
+      if (images.length > 0) {
+        await propertyService.uploadPropertyImages(data.id, images, propertyToEdit ? null : 0);
+      }
       setSuccess(true);
       
       // Call the onFormSubmit callback with the submitted data
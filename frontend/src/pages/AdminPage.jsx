@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import Layout from '../components/layout/Layout';
 import PropertyForm from '../PropertyForm';
+import { authHeaders, propertyService } from '../services/api';
 import './AdminPage.css';
 
 function AdminPage() {
@@ -20,12 +21,13 @@ function AdminPage() {
   const fetchProperties = async () => {
     setLoading(true);
     try {
-      const response = await fetch('http://127.0.0.1:8000/api/properties/');
-      if (!response.ok) {
-        throw new Error('Failed to fetch properties');
-      }
-      const data = await response.json();
-      setProperties(data);
+      // The listing defaults to active rows; staff need the deactivated ones
+      // too in order to reactivate them
+      const [active, inactive] = await Promise.all([
+        propertyService.getAllProperties(),
+        propertyService.getAllProperties({ is_active: false }),
+      ]);
+      setProperties([...active, ...inactive]);
     } catch (error) {
       console.error('Error fetching properties:', error);
       setError('Failed to load properties. Please try again later.');
@@ -75,6 +77,7 @@ function AdminPage() {
     try {
       const response = await fetch(`http://127.0.0.1:8000/api/properties/${id}/`, {
         method: 'DELETE',
+        headers: authHeaders(),
       });
       
       if (!response.ok) {
@@ -213,8 +216,8 @@ function AdminPage() {
                             <tr key={property.id}>
                               <td>{property.id}</td>
                               <td className="property-image-cell">
-                                {property.images && property.images.length > 0 ? (
-                                  <img src={property.images[0].image} alt={property.title} />
+                                {property.cover_image ? (
+                                  <img src={property.cover_image} alt={property.title} />
                                 ) : (
                                   <div className="no-image">No Image</div>
                                 )}
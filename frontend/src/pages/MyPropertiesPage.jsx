@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import './MyPropertiesPage.css';
+import { authHeaders, propertyService } from '../services/api';
 
 function MyPropertiesPage() {
   const navigate = useNavigate();
@@ -40,14 +41,8 @@ function MyPropertiesPage() {
         return;
       }
       
-      // Fetch properties from the backend API
-      const response = await fetch(`http://localhost:8000/api/properties/?user=${loggedInUser.id}`);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! Status: ${response.status}`);
-      }
-      
-      const data = await response.json();
+      // Every page of the user's listings, so the statistics count them all
+      const data = await propertyService.getAllProperties({ user: loggedInUser.id });
       setProperties(data);
       
       // Calculate property statistics
@@ -80,7 +75,7 @@ function MyPropertiesPage() {
         method: 'DELETE',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${JSON.parse(localStorage.getItem('user')).token}`
+          ...authHeaders()
         }
       });
       
@@ -222,8 +217,8 @@ function MyPropertiesPage() {
                 <div key={property.id} className="property-card">
                   <div className="property-card-header">
                     <div className="property-image">
-                      {property.images && property.images.length > 0 ? (
-                        <img src={property.images[0].image} alt={property.title} />
+                      {property.cover_image ? (
+                        <img src={property.cover_image} alt={property.title} />
                       ) : (
                         <div className="no-image">
                           <i className="fas fa-home"></i>
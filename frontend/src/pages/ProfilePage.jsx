@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { propertyService } from '../services/api';
 import './ProfilePage.css';
 
 function ProfilePage() {
@@ -73,13 +74,9 @@ function ProfilePage() {
       
       // Try to fetch from API first
       try {
-        const response = await fetch(`http://localhost:8000/api/properties/?user=${userData.id}`);
-        
-        if (response.ok) {
-          const properties = await response.json();
-          updateStatsFromProperties(properties);
-          return;
-        }
+        const properties = await propertyService.getAllProperties({ user: userData.id });
+        updateStatsFromProperties(properties);
+        return;
       } catch (error) {
         console.log('API not available, using mock data for stats');
       }
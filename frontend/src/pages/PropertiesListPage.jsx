@@ -15,10 +15,12 @@ function PropertiesListPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [properties, setProperties] = useState([]);
+  const [facets, setFacets] = useState(null);
   const [showFilters, setShowFilters] = useState(true);
   const [currentPage, setCurrentPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
-  const [itemsPerPage] = useState(12);
+  // Cursor URL of the next page, null once the last page is loaded
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Search input reference for focus
   const searchInputRef = useRef(null);
@@ -65,19 +67,22 @@ function PropertiesListPage() {
         if (filters.bedrooms) apiParams.bedrooms = filters.bedrooms;
         if (filters.bathrooms) apiParams.bathrooms = filters.bathrooms;
         if (filters.city) apiParams.city = filters.city;
-        if (filters.search) apiParams.search = filters.search;
+        if (filters.search) apiParams.q = filters.search;
+        if (filters.sort) apiParams.ordering = filters.sort;
         
         console.log('Fetching properties with filters:', apiParams);
+
+        // Sidebar counts come from the server; a failure only hides them
+        propertyService.getPropertyFacets(apiParams)
+          .then(setFacets)
+          .catch(() => setFacets(null));
         
-        // Use our propertyService to fetch properties
-        const data = await propertyService.getProperties(apiParams);
-        console.log('Properties loaded:', data.length);
-        
-        // Calculate pagination
-        const totalItems = data.length;
-        setTotalPages(Math.ceil(totalItems / itemsPerPage));
+        // First page only; further pages are loaded on demand through `next`
+        const page = await propertyService.getPropertyPage(apiParams);
+        console.log('Properties loaded:', page.results.length);
         
-        setProperties(data);
+        setProperties(page.results);
+        setNextPage(page.next);
         setError(null); // Clear any previous errors
       } catch (err) {
         console.error('Error fetching properties:', err);
@@ -88,7 +93,23 @@ function PropertiesListPage() {
     };
     
     fetchProperties();
-  }, [filters, itemsPerPage]);
+  }, [filters]);
+  
+  // Append the next page of the listing
+  const loadMore = async () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const page = await propertyService.getPropertyPage({}, nextPage);
+      setProperties(prev => [...prev, ...page.results]);
+      setNextPage(page.next);
+    } catch (err) {
+      console.error('Error loading more properties:', err);
+      setError('Failed to load more properties. Please try again later.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
   
   // Handle search submit
   const handleSearchSubmit = (e) => {
@@ -237,6 +258,7 @@ function PropertiesListPage() {
               <div className="filters-sidebar">
                 <PropertyFilters 
                   filters={filters}
+                  facets={facets}
                   onFilterChange={handleFilterChange}
                   onApplyFilters={() => {/* Filters are applied automatically */}}
                   onResetFilters={resetFilters}
@@ -248,7 +270,8 @@ function PropertiesListPage() {
             <div className="properties-content">
               <div className="properties-header">
                 <div className="properties-count">
-                  <p><strong>{filteredProperties.length}</strong> properties found</p>
+                  {/* The facet total counts every match, not just the loaded pages */}
+                  <p><strong>{facets ? facets.total : filteredProperties.length}</strong> properties found</p>
                 </div>
                 
                 <div className="sort-options">
@@ -293,10 +316,15 @@ function PropertiesListPage() {
                 </div>
               )}
               
-              {/* Pagination will be added later */}
               {!loading && !error && filteredProperties.length > 0 && (
                 <div className="pagination-placeholder">
-                  <p>Showing all {filteredProperties.length} results</p>
+                  {nextPage ? (
+                    <button className="btn btn-primary" onClick={loadMore} disabled={loadingMore}>
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                  ) : (
+                    <p>Showing all {filteredProperties.length} results</p>
+                  )}
                 </div>
               )}
             </div>
@@ -9,6 +9,10 @@ const API = axios.create({
   baseURL: 'http://localhost:8000/api',
 });
 
+// Image uploads are sent in chunks of this size and resumed on failure
+const UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 3;
+
 // Add request interceptor for authentication
 API.interceptors.request.use(
   (config) => {
@@ -21,6 +25,36 @@ API.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// Access tokens are short-lived: on a 401, trade the refresh token for a new
+// pair once and retry the original request
+API.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const refresh = localStorage.getItem('refreshToken');
+    if (error.response && error.response.status === 401 && refresh && !original._retried) {
+      original._retried = true;
+      try {
+        const { data } = await axios.post(`${API.defaults.baseURL}/token/refresh/`, { refresh });
+        localStorage.setItem('token', data.token);
+        localStorage.setItem('refreshToken', data.refresh);
+        original.headers['Authorization'] = `Bearer ${data.token}`;
+        return API(original);
+      } catch (refreshError) {
+        localStorage.removeItem('token');
+        localStorage.removeItem('refreshToken');
+      }
+    }
+    return Promise.reject(error);
+  }
+);
+
+// Authorization header for requests made with fetch() instead of the API instance
+export const authHeaders = () => {
+  const token = localStorage.getItem('token');
+  return token ? { 'Authorization': `Bearer ${token}` } : {};
+};
+
 // Authentication Services
 export const authService = {
   // Login user
@@ -48,6 +82,7 @@ export const authService = {
       const response = await API.post('/login/', credentials);
       if (response.data.token) {
         localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refresh);
       }
       return response.data;
     } catch (error) {
@@ -80,6 +115,10 @@ export const authService = {
       }
       
       const response = await API.post('/register/', userData);
+      if (response.data.token) {
+        localStorage.setItem('token', response.data.token);
+        localStorage.setItem('refreshToken', response.data.refresh);
+      }
       return response.data;
     } catch (error) {
       console.error('Registration error:', error);
@@ -90,6 +129,7 @@ export const authService = {
   // Logout user
   logout: () => {
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('user');
   },
   
@@ -174,7 +214,8 @@ export const propertyService = {
       }
       
       const response = await API.get('/properties/', { params: filters });
-      return response.data;
+      // The listing endpoint is cursor-paginated: { next, previous, results }
+      return response.data.results;
     } catch (error) {
       console.error('Error fetching properties:', error);
       // Fallback to mock data if API call fails
@@ -182,6 +223,34 @@ export const propertyService = {
     }
   },
   
+  // One page of the listing: { next, previous, results }. Pass the `next`
+  // URL of the previous page to get the one after it.
+  getPropertyPage: async (filters = {}, pageUrl = null) => {
+    if (USE_MOCK_DATA) {
+      return { next: null, previous: null, results: mockProperties };
+    }
+    const response = pageUrl
+      ? await API.get(pageUrl)
+      : await API.get('/properties/', { params: filters });
+    return response.data;
+  },
+  
+  // Every listing matching the filters, following the cursor to the last
+  // page (tables and statistics need all of them, not the first page)
+  getAllProperties: async (filters = {}) => {
+    if (USE_MOCK_DATA) {
+      return mockProperties;
+    }
+    const results = [];
+    let page = await propertyService.getPropertyPage({ page_size: 100, ...filters });
+    results.push(...page.results);
+    while (page.next) {
+      page = await propertyService.getPropertyPage({}, page.next);
+      results.push(...page.results);
+    }
+    return results;
+  },
+  
   // Get property by ID
   getPropertyById: async (id) => {
     try {
@@ -223,6 +292,13 @@ export const propertyService = {
       return mockProperties.filter(p => p.featured);
     }
   },
+
+  // Get listing counts per city, type, status, price and bedrooms for the
+  // current filters (each facet ignores its own filter)
+  getPropertyFacets: async (filters = {}) => {
+    const response = await API.get('/properties/facets/', { params: filters });
+    return response.data;
+  },
   
   // Create new property
   createProperty: async (propertyData) => {
@@ -309,17 +385,39 @@ export const propertyService = {
     }
   },
   
-  // Upload property images
-  uploadPropertyImages: async (id, images) => {
-    const formData = new FormData();
-    images.forEach((image) => {
-      formData.append('images', image);
-    });
-    
-    const response = await API.post(`/properties/${id}/images/`, formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data',
-      },
+  // Upload property images in resumable chunks, then attach them by id.
+  // A failed chunk is retried from the offset the server reports; `cover`
+  // is the index of the image to make the cover, if any.
+  uploadPropertyImages: async (id, images, cover = null) => {
+    const uploadIds = [];
+    for (const image of images) {
+      const { data: upload } = await API.post('/uploads/', { filename: image.name, size: image.size });
+      let offset = 0;
+      let failures = 0;
+      while (offset < image.size) {
+        try {
+          const chunk = image.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+          const response = await API.patch(`/uploads/${upload.id}/`, chunk, {
+            headers: {
+              'Content-Type': 'application/offset+octet-stream',
+              'Upload-Offset': offset,
+            },
+          });
+          offset = response.data.offset;
+          failures = 0;
+        } catch (error) {
+          if (++failures > UPLOAD_MAX_RETRIES) throw error;
+          await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+          const { data } = await API.get(`/uploads/${upload.id}/`);
+          offset = data.offset;
+        }
+      }
+      uploadIds.push(upload.id);
+    }
+
+    const response = await API.post(`/properties/${id}/images/`, {
+      uploads: uploadIds,
+      cover: cover === null ? null : uploadIds[cover],
     });
     return response.data;
   },